@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    netrpc
+    ~~~~~~
+
+    Measures the throughput of OEConnection's wire path against the one of
+    oersted 1.3.0 (pickle protocol 0, reply read by string concatenation) on
+    a local NetRPC server replying like OpenERP does, with protocol 0.
+
+        python benchmarks/netrpc.py --rows 20000 --repeat 5
+"""
+import argparse
+import cPickle
+import socket
+import threading
+import time
+
+from oersted.oesocket import OEConnection
+
+
+class LegacyOEConnection(OEConnection):
+    "OEConnection with the wire path of oersted 1.3.0"
+
+    def send(self, message, exception=False, traceback=None):
+        if self.socket is None:
+            self.connect()
+        picked = cPickle.dumps([message, traceback])
+        self.socket.sendall('%8d%s%s' % (len(picked),
+                                         '1' if exception else '0', picked))
+
+    def read(self, size):
+        buf = ''
+        while len(buf) < size:
+            chunk = self.socket.recv(size - len(buf))
+            if chunk == '':
+                raise RuntimeError
+            buf += chunk
+        return buf
+
+    def receive(self):
+        size = int(self.read(8))
+        self.read(1)
+        obj, err = cPickle.loads(self.read(size))
+        return obj
+
+
+def make_rows(count):
+    return [{'id': i, 'name': u'Product %d' % i, 'default_code': 'P%06d' % i,
+             'list_price': i * 1.25, 'categ_id': (i % 50, u'Category'),
+             'active': True, 'description': u'x' * 80}
+            for i in xrange(1, count + 1)]
+
+
+def serve(listener, rows):
+    "Answer 'read' with rows and anything else with True"
+    # pickled once so that only the client side is measured
+    rows_data = cPickle.dumps([rows, None])
+    true_data = cPickle.dumps([True, None])
+    while True:
+        conn, addr = listener.accept()
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        stream = conn.makefile('rb')
+        try:
+            while True:
+                header = stream.read(9)
+                if len(header) < 9:
+                    break
+                message, traceback = cPickle.loads(stream.read(int(header[:8])))
+                data = rows_data if message[6] == 'read' else true_data
+                conn.sendall('%8d0%s' % (len(data), data))
+        finally:
+            stream.close()
+            conn.close()
+
+
+def measure(conn, message, repeat):
+    "Return the best time of repeat calls"
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        conn.execute(message)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=20000,
+                        help='number of records in the read reply')
+    parser.add_argument('--payload', type=int, default=5000000,
+                        help='size in bytes of the created binary value')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    reply_size = len(cPickle.dumps([rows, None]))
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(5)
+    server = threading.Thread(target=serve, args=(listener, rows))
+    server.daemon = True
+    server.start()
+    host, port = listener.getsockname()
+
+    read = ('object', 'execute', 'db', 1, 'admin', 'product.product',
+            'read', range(1, args.rows + 1), [])
+    create = ('object', 'execute', 'db', 1, 'admin', 'ir.attachment',
+              'create', {'name': 'file', 'datas': '\xff' * args.payload})
+    print('%-10s %-8s %10s %10s' % ('path', 'call', 'seconds', 'MB/s'))
+    for name, klass in (('1.3.0', LegacyOEConnection),
+                        ('current', OEConnection)):
+        conn = klass(host, port, None)
+        for call, message, size in (('read', read, reply_size),
+                                    ('create', create, args.payload)):
+            elapsed = measure(conn, message, args.repeat)
+            print('%-10s %-8s %10.4f %10.1f' % (name, call, elapsed,
+                                                size / elapsed / 1e6))
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
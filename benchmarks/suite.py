@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    suite
+    ~~~~~
+
+    Runs the typical browse, search, save and view workloads against
+    oersted.fakeserver and reports for each of them the RPCs and bytes per
+    operation, latency percentiles, throughput and the peak memory of the
+    process so far. The server runs in the process, so its memory is
+    included, and the peak only grows from one workload to the next: run a
+    workload alone to measure its memory. The hold workload keeps the
+    records it reads, to compare the memory used with and without
+    --compact.
+
+        python benchmarks/suite.py --records 10000 --ops 100 --latency 1
+        python benchmarks/suite.py --records 100000 --batch 5000 --ops 20 \
+            --compact hold
+"""
+import argparse
+import resource
+import time
+
+from oersted import OEClient
+from oersted.fakeserver import FakeServer
+
+
+def percentile(times, percent):
+    "Return the percent percentile of the sorted times"
+    return times[int(round(percent / 100.0 * (len(times) - 1)))]
+
+
+def peak_memory():
+    "Return the peak resident size of the process in MB"
+    # ru_maxrss is in kB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def workloads(client, server, args):
+    "Return (name, operation) tuples, operations are called with their rank"
+    database = server.database
+    Record = client.create_browse(database, 'bench.record')
+    Line = client.create_browse(database, 'bench.record.line')
+    condition = [('state', '=', 'done')]
+    held = []
+
+    def window(rank):
+        start = rank * args.batch % args.records
+        return range(start + 1, min(start + args.batch, args.records) + 1)
+
+    def browse(rank):
+        for record in Record.browse(window(rank)):
+            record.name, record.amount, record.date
+            record.category_id.name
+
+    def search(rank):
+        for record in Record.search(condition, rank * args.batch,
+                                    args.batch):
+            record.name, record.amount
+
+    def search_read(rank):
+        for record in Record.search_read(condition, None, rank * args.batch,
+                                         args.batch):
+            record.name, record.amount
+
+    def hold(rank):
+        records = Record.search_read(None, None,
+                                     rank * args.batch % args.records,
+                                     args.batch)
+        for record in records:
+            record.name, record.category_id
+        held.extend(records)
+
+    def columns(rank):
+        Record.to_columns(['name', 'amount', 'date', 'category_id', 'state'],
+                          ids=window(rank))
+
+    def save(rank):
+        record = Record(name=u'Saved %d' % rank, amount=rank * 0.5,
+                        category_id=rank % 10 + 1)
+        record.save()
+        record.line_ids.append(Line(name=u'Line', price=1.5))
+        record.line_ids.append(Line(name=u'Line', price=2.5))
+        record.save()
+        record.amount = rank * 2.0
+        record.save()
+
+    def view(rank):
+        View = client.create_view(database, 'bench.view_record_form')
+        record = View(window(rank)[0])
+        record.name, record.amount, record.category_id
+
+    return [('browse', browse), ('search', search),
+            ('search_read', search_read), ('hold', hold),
+            ('columns', columns), ('save', save), ('view', view)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--records', type=int, default=10000,
+                        help='number of bench.record records')
+    parser.add_argument('--lines', type=int, default=20000,
+                        help='number of bench.record.line records')
+    parser.add_argument('--batch', type=int, default=100,
+                        help='records browsed or searched per operation')
+    parser.add_argument('--ops', type=int, default=100,
+                        help='operations per workload')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='milliseconds added to each call by the server')
+    parser.add_argument('--transport', default='netrpc',
+                        choices=('netrpc', 'xmlrpc', 'jsonrpc'))
+    parser.add_argument('--server-version', default='6.0.4')
+    parser.add_argument('--float-conversion', default='decimal',
+                        choices=('decimal', 'float', 'fixed'))
+    parser.add_argument('--compact', action='store_true',
+                        help='use compact Browse instances')
+    parser.add_argument('workloads', nargs='*',
+                        help='workloads to run, all by default')
+    args = parser.parse_args()
+
+    server = FakeServer(version=args.server_version,
+                        latency=args.latency / 1000.0)
+    server.add_synthetic_model('bench.record', args.records, args.lines)
+    server.add_view('bench.view_record_form', 'bench.record')
+    server.start()
+    port = server.netrpc_port if args.transport == 'netrpc' \
+        else server.http_port
+    client = OEClient('127.0.0.1', port, transport=args.transport,
+                      float_conversion=args.float_conversion,
+                      compact=args.compact)
+    client.login(server.database, server.login, server.password)
+
+    print('%-12s %9s %7s %8s %8s %8s %8s %13s' % (
+        'workload', 'ops/s', 'rpc/op', 'kB/op', 'p50 ms', 'p90 ms',
+        'p99 ms', 'peak MB so far'))
+    for name, operation in workloads(client, server, args):
+        if args.workloads and name not in args.workloads:
+            continue
+        # the first call creates the classes and reads the definitions
+        operation(0)
+        server.reset()
+        times = []
+        for rank in xrange(1, args.ops + 1):
+            start = time.time()
+            operation(rank)
+            times.append(time.time() - start)
+        calls = sum(server.calls.values())
+        size = server.received + server.sent
+        times.sort()
+        print('%-12s %9.1f %7.1f %8.1f %8.2f %8.2f %8.2f %13.1f' % (
+            name, args.ops / sum(times), float(calls) / args.ops,
+            size / 1024.0 / args.ops, percentile(times, 50) * 1000,
+            percentile(times, 90) * 1000, percentile(times, 99) * 1000,
+            peak_memory()))
+    client.close()
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
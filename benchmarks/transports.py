@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    transports
+    ~~~~~~~~~~
+
+    Compares the NetRPC, XML-RPC and JSON-RPC transports on the same
+    workloads, served by oersted.fakeserver on 127.0.0.1.
+
+        python benchmarks/transports.py --records 5000 --repeat 5
+"""
+import argparse
+import time
+
+from oersted import OEClient
+from oersted.fakeserver import FakeServer
+
+
+def measure(func, repeat):
+    "Return the best time of repeat calls"
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--records', type=int, default=5000,
+                        help='number of res.partner records')
+    parser.add_argument('--calls', type=int, default=200,
+                        help='number of small calls of the latency workload')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    server = FakeServer(partners=args.records).start()
+    ids = range(1, args.records + 1)
+    fields = ['name', 'amount', 'parent_id']
+    print('%-10s %-8s %10s %10s' % ('transport', 'workload', 'seconds',
+                                     'calls/s'))
+    for transport, port in (('netrpc', server.netrpc_port),
+                            ('xmlrpc', server.http_port),
+                            ('jsonrpc', server.http_port)):
+        client = OEClient('127.0.0.1', port, transport=transport)
+        client.login(server.database, server.login, server.password)
+        proxy = client.create_proxy(server.database, 'res.partner')
+
+        def small():
+            for i in xrange(args.calls):
+                proxy.search_count([])
+
+        workloads = (('small', small, args.calls),
+                     ('search', lambda: proxy.search([]), 1),
+                     ('read', lambda: proxy.read(ids, fields), 1))
+        for name, func, calls in workloads:
+            elapsed = measure(func, args.repeat)
+            print('%-10s %-8s %10.4f %10.1f' % (transport, name, elapsed,
+                                                calls / elapsed))
+        client.close()
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
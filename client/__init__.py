@@ -2,6 +2,7 @@
 
 from client import OEClient
 from oesocket import ERPError
-from browse import BrowseNotFoundError
+from browse import BrowseNotFoundError, LoadError
+from unitofwork import UnitOfWork
 
 __version__ = '1.3.0'
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""asyncio flavour of OEClient
+
+The transport speaks the same NetRPC framing as OEConnection over asyncio
+streams. On Python 2 asyncio is provided by trollius, which has to be
+installed separately::
+
+    >>> client = AsyncOEClient('localhost')
+    >>> yield From(client.login('database', 'admin', 'password'))
+    >>> partner_obj = client.create_proxy('database', 'res.partner')
+    >>> names = yield From(asyncio.gather(*[partner_obj.read(oid, ['name'])
+    ...                                      for oid in ids]))
+"""
+
+import cPickle
+import os
+
+import trollius as asyncio
+from trollius import From, Return
+
+from client import Context, Credentials, ProxyObj
+from oesocket import ERPError, parse_version
+
+
+class AsyncOEConnection(object):
+
+    def __init__(self, host, port, loop=None):
+        self.host = host
+        self.port = port
+        self.loop = loop
+        self.reader = None
+        self.writer = None
+        self.connects = 0 # number of sockets opened
+        self.reuses = 0 # number of messages sent on an already open socket
+
+    @asyncio.coroutine
+    def connect(self):
+        self.close()
+        self.reader, self.writer = yield From(
+            asyncio.open_connection(self.host, self.port, loop=self.loop))
+        self.connects += 1
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = None
+        self.writer = None
+
+    @asyncio.coroutine
+    def execute(self, message):
+        picked = cPickle.dumps([message, None])
+        if self.reader is None or self.reader.at_eof():
+            yield From(self.connect())
+        else:
+            self.reuses += 1
+        try:
+            self.writer.write('%8d0%s' % (len(picked), picked))
+            header = yield From(self.reader.readexactly(9))
+            size = int(header[:8])
+            exception = header[8] != '0'
+            data = yield From(self.reader.readexactly(size))
+            obj, err = cPickle.loads(data)
+        except:
+            # The stream is out of sync, the socket can not be reused
+            self.close()
+            raise
+
+        # The server drops the connection after having sent an exception
+        if exception:
+            self.close()
+
+        if isinstance(obj, Exception):
+            raise ERPError(obj, err)
+        raise Return(obj)
+
+
+class AsyncOEConnectionPool(object):
+    """Bounded pool of AsyncOEConnection
+
+    NetRPC carries one message at a time per socket, the number of RPCs in
+    flight is thus bounded by max_size.
+    """
+
+    def __init__(self, host, port, max_size=100, loop=None):
+        self.host = host
+        self.port = port
+        self.max_size = max_size
+        self.loop = loop
+        self._idle = []
+        self._semaphore = asyncio.Semaphore(max_size, loop=loop)
+
+    @asyncio.coroutine
+    def execute(self, message):
+        yield From(self._semaphore.acquire())
+        if self._idle:
+            conn = self._idle.pop()
+        else:
+            conn = AsyncOEConnection(self.host, self.port, loop=self.loop)
+        try:
+            result = yield From(conn.execute(message))
+        finally:
+            self._idle.append(conn)
+            self._semaphore.release()
+        raise Return(result)
+
+    @asyncio.coroutine
+    def server_version(self):
+        version = yield From(self.execute(('db', 'server_version')))
+        raise Return(parse_version(version))
+
+    def close(self):
+        "Closes the idle connections, connections in use are left alone"
+        for conn in self._idle:
+            conn.close()
+
+
+class AsyncProxyObj(ProxyObj):
+    "ProxyObj whose methods return coroutines"
+
+    @asyncio.coroutine
+    def search_read(self, condition=None, fields=None, offset=0, limit=None,
+                    order_by=None):
+        "Return the values of the records matching condition"
+        ids = yield From(self.search(condition, offset, limit, order_by))
+        if not ids:
+            raise Return([])
+        values = yield From(self.read(ids, fields or []))
+        values = dict((record_values['id'], record_values)
+                      for record_values in values)
+        raise Return([values[id] for id in ids if id in values])
+
+
+class AsyncContext(Context):
+
+    @asyncio.coroutine
+    def reload(self, database, user, password):
+        context = yield From(self.cnx.execute(('object', 'execute', database,
+                                               user, password, 'res.users',
+                                               'context_get')))
+        self.clear()
+        self.update(context or {})
+
+
+class AsyncOEClient(object):
+
+    def __init__(self, host='localhost', port=8070, pool_size=100,
+                 loop=None):
+        """
+        :param pool_size: maximum number of connections opened at once, that
+                          is the maximum number of RPCs in flight
+        """
+        self.host = host
+        self.port = port
+        self.credentials = Credentials()
+        self.oe_conn = AsyncOEConnectionPool(self.host, self.port,
+                                             max_size=pool_size, loop=loop)
+        self.context = AsyncContext(self.oe_conn)
+
+    def execute(self, command):
+        return self.oe_conn.execute(command)
+
+    def close(self):
+        "Closes the idle connections to the server"
+        self.oe_conn.close()
+
+    def create_proxy(self, db, object, context=True):
+        context = context and self.context or None
+        return AsyncProxyObj(object, db, self.credentials[db], context,
+                             self.oe_conn)
+
+    @asyncio.coroutine
+    def login(self, db=None, user=None, password=None):
+        """
+        Login phase, if no db, user, password, use environnement variable
+
+        :param db: name of the database
+        :param user: name of the user to identify
+        :param password: user's password
+        :return: user ID
+        """
+        if db is None:
+            db = os.environ.get('OERP_DATABASE', 'demo')
+
+        user = user or os.environ.get('OERP_USERNAME', 'admin')
+        password = password or os.environ.get('OERP_PASSWORD', 'admin')
+
+        self.credentials[db]['login'] = user
+        self.credentials[db]['password'] = password
+        if 'uid' in self.credentials[db]:
+            del self.credentials[db]['uid']
+
+        uid = yield From(self.execute(('common', 'login', db, user, password)))
+        if uid:
+            self.credentials[db]['uid'] = uid
+            yield From(self.context.reload(db, uid, password))
+        raise Return(bool(uid))
@@ -5,43 +5,207 @@
 
 
 import base64
+import collections
 import datetime
 import decimal
 import os
+from multiprocessing.pool import ThreadPool
+
+import nplusone
+import unitofwork
+
+# how float fields are converted, see FloatDescriptor
+FLOAT_CONVERSIONS = ('decimal', 'float', 'fixed')
+
+_datetimes = {} # memo of parse_datetime
+_datetimes_size = 4096
+
+
+def parse_datetime(value):
+    "Return the datetime of a date or datetime sent by the server"
+    try:
+        return _datetimes[value]
+    except KeyError:
+        pass
+    if len(value) == 10:
+        result = datetime.datetime(int(value[:4]), int(value[5:7]),
+                                   int(value[8:10]))
+    elif len(value) == 19:
+        result = datetime.datetime(int(value[:4]), int(value[5:7]),
+                                   int(value[8:10]), int(value[11:13]),
+                                   int(value[14:16]), int(value[17:19]))
+    else:
+        result = datetime.datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+    if len(_datetimes) >= _datetimes_size:
+        _datetimes.clear()
+    _datetimes[value] = result
+    return result
+
+
+MISSING = object() # value of the fields of a Row not read
+
+
+class Row(object):
+    """Values of the fields of a compact record
+
+    They are stored in a tuple at the positions of the fields in the class
+    (Browse._positions), fields not read are MISSING. A Row provides the
+    read only methods of a dict. The values converted by the descriptors
+    are kept the same way in converted, see Browse._cache.
+    """
+    __slots__ = ('positions', 'values', 'converted')
+
+    def __init__(self, positions):
+        self.positions = positions
+        self.values = None
+        self.converted = None
+
+    def __contains__(self, name):
+        position = self.positions.get(name)
+        return (position is not None and self.values is not None
+                and self.values[position] is not MISSING)
+
+    def __getitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        return self.values[self.positions[name]]
+
+    def get(self, name, default=None):
+        if name not in self:
+            return default
+        return self.values[self.positions[name]]
+
+    def items(self):
+        if self.values is None:
+            return []
+        return [(name, self.values[position])
+                for name, position in self.positions.items()
+                if self.values[position] is not MISSING]
+
+    def update(self, values):
+        """Store values, those of unknown fields are dropped, and forget
+        their converted values"""
+        row = list(self.values or (MISSING,) * len(self.positions))
+        converted = self.converted and list(self.converted)
+        for name, value in values.items():
+            position = self.positions.get(name)
+            if position is not None:
+                row[position] = value
+                if converted:
+                    converted[position] = MISSING
+        self.values = tuple(row)
+        if converted:
+            self.converted = tuple(converted)
+
+    def cached(self, name):
+        "Return the converted value of name, MISSING if there is none"
+        if self.converted is None:
+            return MISSING
+        return self.converted[self.positions[name]]
+
+    def cache(self, name, value):
+        converted = list(self.converted or (MISSING,) * len(self.positions))
+        converted[self.positions[name]] = value
+        self.converted = tuple(converted)
+
+    def cached_items(self):
+        "Return the converted values by name"
+        if self.converted is None:
+            return {}
+        return dict((name, self.converted[position])
+                    for name, position in self.positions.items()
+                    if self.converted[position] is not MISSING)
+
+
+class ReadOnlyDict(dict):
+    "Empty dict shared by compact records, see Browse._cache"
+
+    def __setitem__(self, key, value):
+        raise TypeError('read only dict')
+
+    __delitem__ = __setitem__
+
+
+NO_CHANGES = frozenset()
+NO_VALUES = ReadOnlyDict()
 
 
 class DefaultDescriptor(object):
+    # whether attrgetter builds a value worth keeping in _browse_values
+    converts = False
 
     def __init__(self, attrname, field_def):
         self.attrname = attrname
 
     def __get__(self, instance, owner):
-        instance._read()
-        if self.attrname not in instance._browse_values:
+        instance._read(self.attrname)
+        value = instance._cached(self.attrname)
+        if value is MISSING:
             try:
-                instance._browse_values[self.attrname] = \
-                        self.attrgetter(instance, owner)
+                value = self.attrgetter(instance, owner)
             except KeyError:
                 return False
-        return instance._browse_values[self.attrname]
+            # compact records do not copy plain values
+            if self.converts or not instance._compact:
+                instance._cache(self.attrname, value)
+        return value
 
     def attrgetter(self, instance, owner):
         return instance._oe_values[self.attrname]
 
+    def convert_group(self, instance, convert):
+        """Convert the value of the field for the records of the prefetch
+        group of instance at once and return the one of instance, the group
+        holds at most _prefetch_size records (see Browse._group)"""
+        name = self.attrname
+        for record in instance._prefetch or ():
+            if (name in record._oe_values
+                and record._cached(name) is MISSING):
+                record._cache(name, convert(record._oe_values[name]))
+        value = instance._cached(name)
+        if value is MISSING:
+            return convert(instance._oe_values[name])
+        return value
+
     def __set__(self, instance, value):
-        instance._changed.add(self.attrname)
+        instance._change(self.attrname)
         instance._browse_values[self.attrname] = value
         instance._oe_values[self.attrname] = value
 
 
+def to_decimal(value):
+    return decimal.Decimal(str(value)) if value else decimal.Decimal(0)
+
+
+def to_float(value):
+    return float(value or 0.0)
+
+
 class FloatDescriptor(DefaultDescriptor):
+    """Converts values according to the _float_conversion of the class:
+    'decimal' to Decimal, 'float' to float and 'fixed' to Decimal rounded
+    to the digits of the field (as 'decimal' if it has none)"""
+    converts = True
+
+    def __init__(self, attrname, field_def):
+        super(FloatDescriptor, self).__init__(attrname, field_def)
+        digits = field_def.get('digits')
+        self.scale = digits[1] if digits else None
+
+    def to_fixed(self, value):
+        return decimal.Decimal('%.*f' % (self.scale, value or 0.0))
 
     def attrgetter(self, instance, owner):
-        value = instance._oe_values.get(self.attrname)
-        if value:
-            return decimal.Decimal(str(value))
+        conversion = owner._float_conversion
+        if conversion == 'float':
+            convert = to_float
+        elif conversion == 'fixed' and self.scale is not None:
+            convert = self.to_fixed
         else:
-            return decimal.Decimal(0)
+            convert = to_decimal
+        if self.attrname not in instance._oe_values:
+            return convert(False)
+        return self.convert_group(instance, convert)
 
     def __set__(self, instance, value):
         super(FloatDescriptor, self).__set__(instance, value)
@@ -49,6 +213,7 @@ class FloatDescriptor(DefaultDescriptor):
 
 
 class M2ODescriptor(DefaultDescriptor):
+    converts = True
 
     def __init__(self, attrname, field_def):
         super(M2ODescriptor, self).__init__(attrname, field_def)
@@ -56,16 +221,32 @@ class M2ODescriptor(DefaultDescriptor):
 
     def attrgetter(self, instance, owner):
         browse_klass = BrowseFactory.get(instance._proxy.database,
-                                         self.relation)
-        if instance._oe_values[self.attrname]:
-            return browse_klass(instance._oe_values[self.attrname][0])
-        else:
+                                         self.relation, instance._client)
+        if not instance._oe_values[self.attrname]:
             return None
+        # Resolve the field on the whole prefetch group of the instance so
+        # that the related records share a prefetch group too
+        related = {}
+        for record in instance._prefetch or [instance]:
+            if record._cached(self.attrname) is not MISSING:
+                continue
+            value = record._oe_values.get(self.attrname)
+            if not value:
+                continue
+            if value[0] not in related:
+                related[value[0]] = browse_klass(value[0])
+                nplusone.tag([related[value[0]]], instance, self.attrname)
+            record._cache(self.attrname, related[value[0]])
+        browse_klass._group(related.values())
+        value = instance._cached(self.attrname)
+        if value is MISSING:
+            raise KeyError(self.attrname)
+        return value
 
     def __set__(self, instance, value):
         if not value:
             return
-        instance._changed.add(self.attrname)
+        instance._change(self.attrname)
         if isinstance(value, (int, long)):
             instance._oe_values[self.attrname] = (value, '')
             if self.attrname in instance._browse_values:
@@ -76,6 +257,7 @@ class M2ODescriptor(DefaultDescriptor):
 
 
 class O2MDescriptor(DefaultDescriptor):
+    converts = True
 
     def __init__(self, attrname, field_def):
         super(O2MDescriptor, self).__init__(attrname, field_def)
@@ -83,15 +265,15 @@ class O2MDescriptor(DefaultDescriptor):
 
     def attrgetter(self, instance, owner):
         browse_klass = BrowseFactory.get(instance._proxy.database,
-                                         self.relation)
-        return BrowseList([browse_klass(oid)
-                           for oid in instance._oe_values[self.attrname]],
-                          instance, self.attrname)
+                                         self.relation, instance._client)
+        records = browse_klass.browse(instance._oe_values[self.attrname])
+        nplusone.tag(records, instance, self.attrname)
+        return BrowseList(records, instance, self.attrname)
 
     def __set__(self, instance, value):
         if value and isinstance(value[0], (int, long)):
             browse_klass = BrowseFactory.get(instance._proxy.database,
-                                             self.relation)
+                                             self.relation, instance._client)
             browse_list = BrowseList([], instance, self.attrname)
             for oid in value:
                 browse_list.append(browse_klass(oid))
@@ -99,34 +281,30 @@ class O2MDescriptor(DefaultDescriptor):
         super(O2MDescriptor, self).__set__(instance, value)
 
 
+def to_datetime(value):
+    return parse_datetime(value) if value else None
+
+
 class DTDescriptor(DefaultDescriptor):
+    converts = True
 
     def attrgetter(self, instance, owner):
-        value = instance._oe_values[self.attrname]
-        if not value:
-            return None
-        return datetime.datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+        return self.convert_group(instance, to_datetime)
 
     def __set__(self, instance, value):
         if isinstance(value, basestring):
-            value = datetime.datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
-        instance._changed.add(self.attrname)
+            value = parse_datetime(value)
+        instance._change(self.attrname)
         instance._browse_values[self.attrname] = value
         instance._oe_values[self.attrname] = value.strftime('%Y-%m-%d %H:%M:%S')
 
 
 class DDescriptor(DTDescriptor):
 
-    def attrgetter(self, instance, owner):
-        value = instance._oe_values[self.attrname]
-        if not value:
-            return None
-        return datetime.datetime.strptime(value, '%Y-%m-%d')
-
     def __set__(self, instance, value):
         if isinstance(value, basestring):
-            value = datetime.datetime.strptime(value, '%Y-%m-%d')
-        instance._changed.add(self.attrname)
+            value = parse_datetime(value)
+        instance._change(self.attrname)
         instance._browse_values[self.attrname] = value
         instance._oe_values[self.attrname] = value.strftime('%Y-%m-%d')
 
@@ -140,16 +318,44 @@ class MetaBrowser(type):
                    'datetime': DTDescriptor,
                    'date': DDescriptor}
 
+    # fields of these types are only read when accessed
+    deferred_types = ('binary',)
+
+    def __new__(mcs, klassname, bases, properties):
+        if properties.get('compact'):
+            # no __dict__ for the instances, see Browse
+            properties = dict(properties, __slots__=())
+        return super(MetaBrowser, mcs).__new__(mcs, klassname, bases,
+                                               properties)
+
     def __init__(cls, klassname, bases, properties):
         super(MetaBrowser, cls).__init__(klassname, bases, {})
         proxy = properties['proxy']
         cls._fields = proxy.fields_get([])
         cls._proxy = proxy
+        cls._client = properties.get('client')
+        cls._identity_map = properties.get('identity_map')
+        if properties.get('float_conversion') is not None:
+            cls._float_conversion = properties['float_conversion']
+        cls._compact = bool(properties.get('compact'))
+        cls._positions = dict((name, position) for position, name
+                              in enumerate(['id'] + sorted(cls._fields)))
+        cls._eager_fields = []
         for name, field_def in cls._fields.items():
             if name == 'id':
                 continue
             factory = cls.descriptors.get(field_def['type'], DefaultDescriptor)
             setattr(cls, name, factory(name, field_def))
+            if cls.eager(field_def):
+                cls._eager_fields.append(name)
+
+    @classmethod
+    def eager(mcs, field_def):
+        "Whether fields like field_def are read along with the others"
+        # non stored function fields are computed on each read
+        return (field_def['type'] not in mcs.deferred_types
+                and not (field_def.get('function')
+                         and not field_def.get('store')))
 
     def __getattr__(self, attrname):
         return getattr(self._proxy, attrname)
@@ -161,46 +367,437 @@ class BrowseNotFoundError(Exception):
         self.id = record_id
 
 
+class LoadError(Exception):
+
+    def __init__(self, messages):
+        super(LoadError, self).__init__(
+            '\n'.join(message['message'] for message in messages))
+        self.messages = messages
+
+
+class GroupRow(dict):
+    """Aggregated values of a group returned by Browse.read_group
+
+    Values are available as items or attributes, count is the number of
+    records in the group and domain the condition matching them.
+    """
+    __slots__ = ('count', 'domain')
+
+    def __init__(self, values, groupby):
+        super(GroupRow, self).__init__(values)
+        self.count = values.get('%s_count' % groupby, values.get('__count'))
+        self.domain = values.get('__domain')
+
+    def __getattr__(self, attrname):
+        try:
+            return self[attrname]
+        except KeyError:
+            raise AttributeError(attrname)
+
+
 class Browse(object):
+    """A record of a model, Browse classes are made by BrowseFactory
+
+    Records of compact classes (OEClient(compact=True)) have no __dict__,
+    they store the values read and their conversions in a Row and share
+    empty _changed and _browse_values until they are modified. Only their
+    fields can be set.
+    """
+    __slots__ = ('id', '_oe_values', '_changed', '_parent',
+                 '_parent_field_name', '_browse_values', '_prefetch',
+                 '_origin', '_initialized', '__weakref__')
+    _prefetch_size = 200 # maximum number of records read at once
+    _client = None # OEClient the class was made for, see BrowseFactory
+    _identity_map = None
+    _float_conversion = 'decimal' # see FloatDescriptor
+    _compact = False
+    _positions = None # position of the fields in the Row of compact records
+
+    def __new__(cls, id=None, **kwargs):
+        # Return the instance already loaded for this record if any
+        if id is not None and cls._identity_map is not None:
+            key = (cls._proxy.database, cls._proxy.model, id)
+            record = cls._identity_map.get(key)
+            if record is None:
+                record = super(Browse, cls).__new__(cls)
+                record._initialized = False
+                cls._identity_map.add(key, record)
+            return record
+        record = super(Browse, cls).__new__(cls)
+        record._initialized = False
+        return record
 
     def __init__(self, id=None, **kwargs):
         assert ((id is not None and not bool(kwargs))
                 or (id is None and bool(kwargs)))
+        if self._initialized:
+            return
+        self._initialized = True
         self.id = id
-        self._oe_values = {} # store the values of fields
-        self._changed = set() # store the changed fields
+        self._reset()
         self._parent = None # store the parent record
         self._parent_field_name = None # store the field name in parent record
-        self._browse_values = {}
+        self._prefetch = None # store the records read together with this one
+        self._origin = None # field through which it was reached, see nplusone
         if id is None:
             for name, value in kwargs.items():
                 setattr(self, name, value)
 
-    def _read(self):
-        if self._oe_values:
+    def _read(self, attrname=None):
+        """Read the eager fields not loaded yet, along with attrname
+
+        Other fields (see MetaBrowser.deferred_types) are read on demand,
+        for this record only since they are the large ones.
+        """
+        if not self.id or attrname in self._oe_values:
             return
-        if not self.id:
+        fields = [name for name in self._eager_fields
+                  if name not in self._oe_values]
+        if fields:
+            self._read_prefetched(fields)
+        if attrname is not None and attrname not in self._eager_fields:
+            values = self._proxy.read([self.id], [attrname])
+            if not values:
+                raise BrowseNotFoundError(self.id)
+            self._update_values(values[0])
+
+    def _read_prefetched(self, fields):
+        "Read fields for the records of the prefetch group"
+        records = {self.id: [self]}
+        for record in self._prefetch or []:
+            if len(records) >= self._prefetch_size:
+                break
+            if record is self or not record.id:
+                continue
+            if [name for name in fields if name not in record._oe_values]:
+                records.setdefault(record.id, []).append(record)
+        if nplusone.detector is not None:
+            nplusone.detector.read(self, records.keys())
+        found = False
+        for values in self._proxy.read(records.keys(), fields):
+            for record in records[values['id']]:
+                record._update_values(values)
+            found = found or values['id'] == self.id
+        if not found:
+            raise BrowseNotFoundError(self.id)
+
+    def _update_values(self, values):
+        """Store values read from the server, keeping the changed ones, and
+        forget the values converted from the previous ones"""
+        if self._changed is NO_CHANGES:
+            self._oe_values.update(values)
             return
-        self._oe_values = self._proxy.read(self.id)
-        # XXX fix for bug #366089
-        if isinstance(self._oe_values, list):
-            self._oe_values, = self._oe_values
-        if not self._oe_values:
-            raise BrowseNotFoundError(id)
+        for name, value in values.items():
+            if name not in self._changed:
+                self._oe_values[name] = value
+                self._browse_values.pop(name, None)
+
+    def _reset(self):
+        "Forget the values of the record"
+        if self._compact:
+            self._oe_values = Row(self._positions)
+            self._changed = NO_CHANGES
+            self._browse_values = NO_VALUES
+        else:
+            self._oe_values = {} # store the values of fields
+            self._changed = set() # store the changed fields
+            self._browse_values = {}
+
+    def _change(self, attrname):
+        "Mark attrname as changed, a compact record gets dicts first"
+        if self._changed is NO_CHANGES:
+            self._browse_values = self._oe_values.cached_items()
+            self._oe_values = dict(self._oe_values.items())
+            self._changed = set()
+        self._changed.add(attrname)
+
+    def _cached(self, attrname):
+        """Return the value of attrname converted by its descriptor, MISSING
+        if there is none"""
+        if self._browse_values is NO_VALUES:
+            return self._oe_values.cached(attrname)
+        return self._browse_values.get(attrname, MISSING)
+
+    def _cache(self, attrname, value):
+        "Keep the value of attrname converted by its descriptor"
+        # unmodified compact records keep it in their Row
+        if self._browse_values is NO_VALUES:
+            self._oe_values.cache(attrname, value)
+        else:
+            self._browse_values[attrname] = value
+
+    @classmethod
+    def search_read(cls, condition=None, fields=None, offset=0, limit=None,
+                    order_by=None):
+        """Return Browse instances matching condition with their fields
+        (by default the eager ones) already read"""
+        return cls._from_values(cls._proxy.search_read(
+            condition, fields or cls._eager_fields, offset, limit, order_by))
+
+    @classmethod
+    def browse(cls, ids):
+        'Return Browse instances read together on first access'
+        records = [cls(id) for id in ids]
+        cls._group(records)
+        return records
+
+    @classmethod
+    def _group(cls, records):
+        """Make records prefetch groups of _prefetch_size records, each read
+        costs then a scan of its group only"""
+        for start in range(0, len(records), cls._prefetch_size):
+            group = records[start:start + cls._prefetch_size]
+            for record in group:
+                record._prefetch = group
 
     @classmethod
     def search(cls, condition=None, offset=0, limit=None, order_by=None):
         'Return Browse instances matching condition'
         if condition is None:
             condition = []
-        ids = cls._proxy.search(condition, offset, limit, order_by)
-        return [cls(id) for id in ids]
+        return cls.browse(cls._proxy.search(condition, offset, limit,
+                                            order_by))
+
+    @classmethod
+    def _from_values(cls, values):
+        "Return Browse instances filled with values read together"
+        records = []
+        for record_values in values:
+            record = cls(record_values['id'])
+            record._update_values(record_values)
+            records.append(record)
+        cls._group(records)
+        return records
+
+    @classmethod
+    def _pages(cls, condition, fields, batch_size, order_by=None, offset=0):
+        """Yield the values of the records matching condition, page by page
+
+        Without order_by, pages are taken after the last id of the previous
+        one, so that records created or deleted meanwhile do not make other
+        records be skipped or repeated. With order_by, pages are taken by
+        offset.
+        """
+        if order_by is None:
+            values = cls._proxy.search_read(condition, fields, offset,
+                                            batch_size, 'id')
+        else:
+            values = cls._proxy.search_read(condition, fields, offset,
+                                            batch_size, order_by)
+        while values:
+            yield values
+            if len(values) < batch_size:
+                break
+            if order_by is None:
+                values = cls._proxy.search_read(
+                    condition + [('id', '>', values[-1]['id'])], fields, 0,
+                    batch_size, 'id')
+            else:
+                offset += batch_size
+                values = cls._proxy.search_read(condition, fields, offset,
+                                                batch_size, order_by)
+
+    @classmethod
+    def iter_search(cls, condition=None, batch_size=None, order_by=None,
+                    fields=None, offset=0):
+        """Iterate over the records matching condition
+
+        Records are searched and read batch_size at a time (by default
+        _prefetch_size), fields defaults to the eager fields. Only the
+        current page is held in memory.
+        """
+        if condition is None:
+            condition = []
+        for values in cls._pages(condition,
+                                 fields or cls._eager_fields,
+                                 batch_size or cls._prefetch_size,
+                                 order_by, offset):
+            for record in cls._from_values(values):
+                yield record
+
+    @classmethod
+    def to_columns(cls, fields, ids=None, domain=None, batch_size=1000):
+        """Return the values of fields of the records by field name, as
+        NumPy arrays if NumPy is installed (see oersted.columns)
+
+        The records are the ones of ids if given, the ones matching domain
+        otherwise, all of them when neither is given. Records are read
+        batch_size at a time, no Browse instance is created.
+        """
+        # imported here so that NumPy is only loaded when needed
+        import columns
+        return columns.to_columns(cls, fields, ids, domain, batch_size)
+
+    @classmethod
+    def export_csv(cls, output, fields, condition=None, batch_size=1000,
+                   offset=0, progress=None):
+        """Write fields (paths as for export_data) of the records matching
+        condition to output as CSV, batch_size records at a time, see
+        oersted.export"""
+        import export
+        return export.export_csv(cls, output, fields, condition, batch_size,
+                                 offset, progress)
+
+    @classmethod
+    def count(cls, condition=None):
+        'Return the number of records matching condition'
+        if condition is None:
+            condition = []
+        return cls._proxy.capabilities.call(
+            'search_count', lambda: cls._proxy.search_count(condition),
+            lambda: len(cls._proxy.search(condition)))
+
+    @classmethod
+    def read_group(cls, condition, fields, groupby, offset=0, limit=None):
+        """Return a GroupRow per value of groupby among the records matching
+        condition, numeric fields are summed by the server
+
+        groupby may be a list, the records are then grouped by its first
+        item only, like the server does.
+        """
+        if isinstance(groupby, basestring):
+            groupby = [groupby]
+        rows = cls._proxy.capabilities.call(
+            'read_group',
+            lambda: cls._proxy.read_group(condition or [], fields, groupby,
+                                          offset, limit),
+            lambda: cls._read_group(condition or [], fields, groupby[0],
+                                    offset, limit))
+        return [GroupRow(row, groupby[0]) for row in rows]
+
+    @classmethod
+    def _read_group(cls, condition, fields, groupby, offset, limit):
+        "Client side read_group for servers lacking it"
+        summed = [name for name in fields if name != groupby
+                  and cls._fields[name]['type'] in ('integer', 'float')]
+        groups = {}
+        for page in cls._pages(condition, summed + [groupby],
+                               cls._prefetch_size):
+            for values in page:
+                key = values[groupby]
+                if isinstance(key, list):
+                    key = tuple(key)
+                if key not in groups:
+                    value = key[0] if isinstance(key, tuple) else key
+                    groups[key] = dict((name, 0) for name in summed)
+                    groups[key].update({
+                        groupby: key, '%s_count' % groupby: 0,
+                        '__domain': condition + [(groupby, '=', value)]})
+                group = groups[key]
+                group['%s_count' % groupby] += 1
+                for name in summed:
+                    group[name] += values[name] or 0
+        # the server orders the groups by the groupby field, empty last
+        boolean = cls._fields[groupby]['type'] == 'boolean'
+        order = sorted(groups, key=lambda key: (key is False and not boolean,
+                                                key))
+        order = order[offset:]
+        if limit:
+            order = order[:limit]
+        return [groups[key] for key in order]
 
     @classmethod
     def name_search(cls, name='', args=None, operator='ilike', limit=80):
         'Return Browse instances'
-        return [cls(id) for id, name in cls._proxy.name_search(name, args,
-                                                               operator, limit)]
+        return cls.browse([id for id, name in
+                           cls._proxy.name_search(name, args, operator,
+                                                  limit)])
+
+    @classmethod
+    def create_many(cls, values, chunk_size=100, workers=None):
+        """Create a record for each dict of values and return their ids
+
+        The values are converted as if they were set on a Browse instance.
+        Each chunk of records holding only plain values (no one2many or
+        many2many) is created by a load call per set of fields given on
+        servers supporting it (>= 7.0), other chunks are created one record
+        at a time by workers threads, by default as many as the client's
+        connections.
+        """
+        reprs = [cls(**vals).oe_repr if vals else {} for vals in values]
+        ids = [None] * len(reprs)
+
+        def create_chunk(start):
+            chunk = reprs[start:start + chunk_size]
+
+            def create():
+                return [cls._proxy.create(vals) for vals in chunk]
+
+            if cls._plain(chunk):
+                chunk_ids = cls._proxy.capabilities.call(
+                    'load', lambda: cls._load(chunk), create)
+            else:
+                chunk_ids = create()
+            ids[start:start + len(chunk)] = chunk_ids
+
+        if workers is None:
+            workers = getattr(cls._proxy.cnx, 'max_size', 1)
+        pool = ThreadPool(workers)
+        try:
+            pool.map(create_chunk, range(0, len(reprs), chunk_size))
+        finally:
+            pool.close()
+        return ids
+
+    @classmethod
+    def _plain(cls, reprs):
+        "Check that the values can be sent to load"
+        for vals in reprs:
+            for value in vals.values():
+                if isinstance(value, (list, tuple, dict)):
+                    return False
+        return True
+
+    @classmethod
+    def _load(cls, reprs):
+        """Create records with load calls, values must be plain
+
+        load writes empty cells as False instead of the defaults, records
+        are loaded together by set of fields given.
+        """
+        groups = collections.OrderedDict()
+        for index, vals in enumerate(reprs):
+            groups.setdefault(tuple(sorted(vals)), []).append(index)
+        ids = [None] * len(reprs)
+        for fields, indexes in groups.items():
+            if fields:
+                group_ids = cls._load_rows(fields,
+                                           [reprs[index] for index in indexes])
+            else:
+                group_ids = [cls._proxy.create({}) for index in indexes]
+            for index, id in zip(indexes, group_ids):
+                ids[index] = id
+        return ids
+
+    @classmethod
+    def _load_rows(cls, fields, reprs):
+        "Create records giving values for the same fields with one load call"
+        columns = []
+        for name in fields:
+            if cls._fields.get(name, {}).get('type') == 'many2one':
+                columns.append('%s/.id' % name)
+            else:
+                columns.append(name)
+        rows = []
+        for vals in reprs:
+            row = []
+            for name in fields:
+                value = vals[name]
+                if cls._fields.get(name, {}).get('type') == 'boolean':
+                    row.append('1' if value else '0')
+                elif value is None or value is False:
+                    row.append('')
+                elif isinstance(value, float):
+                    row.append(repr(value))
+                elif isinstance(value, (int, long)):
+                    row.append(str(value))
+                else:
+                    row.append(value)
+            rows.append(row)
+        result = cls._proxy.load(columns, rows)
+        if not result['ids']:
+            raise LoadError(result['messages'])
+        return result['ids']
 
     @property
     def oe_repr(self):
@@ -219,26 +816,38 @@ class Browse(object):
                     value[attrname] = value[attrname][0]
         return value
 
+    def _dependencies(self):
+        "Return the new records this record refers to through a many2one"
+        return [value for name, value in self._browse_values.items()
+                if name in self._changed and isinstance(value, Browse)
+                and value.id is None]
+
+    def _clean_cache(self):
+        self._reset()
+
     def save(self):
+        uow = unitofwork.current()
+        if uow is not None and not uow.flushing:
+            uow.register(self)
+            return
         if self.id is None:
             self.id = self._proxy.create(self.oe_repr)
+            if self._identity_map is not None:
+                self._identity_map.add((self._proxy.database,
+                                        self._proxy.model, self.id), self)
         else:
             if not self._changed:
                 return
             self._proxy.write([self.id], self.oe_repr)
-        # clean cache
-        self._oe_values = {}
-        self._changed = set()
-        self._browse_values = {}
+        self._clean_cache()
 
     def reload(self):
         for attrname in self._changed:
             browse_value = self._browse_values.get(attrname)
             if isinstance(browse_value, (Browse, BrowseList)):
                 browse_value.reload()
-        self._changed = set()
-        self._browse_values = {}
-        self._oe_values = self._proxy.read(self.id)
+        self._reset()
+        self._read()
 
     def __cmp__(self, other):
         return cmp((self._proxy.database, self._proxy.model, self.id),
@@ -265,7 +874,7 @@ class BrowseList(list):
         self.item_removed = set()
 
     def changed(self):
-        self.parent._changed.add(self.parent_name)
+        self.parent._change(self.parent_name)
 
     def reload(self):
         for item in self:
@@ -325,17 +934,27 @@ class BrowseList(list):
 
 
 class BrowseFactory(object):
-    _browse_classes = {}
-    _client = None
+    """Makes the Browse classes of a client, kept in its browse_classes so
+    that clients with other options or connections get their own"""
+    _client = None # client of the last create_browse
 
     @classmethod
-    def get(cls, database, dotted_name):
-        proxy = cls._client.create_proxy(database, dotted_name)
-        if (database, dotted_name) not in cls._browse_classes:
-            klass =  MetaBrowser(dotted_name, (Browse,), {'proxy': proxy})
-
-            cls._browse_classes[(database, dotted_name)] = klass
-        return cls._browse_classes[(database, dotted_name)]
+    def get(cls, database, dotted_name, client=None):
+        client = client or cls._client
+        classes = client.browse_classes
+        if (database, dotted_name) not in classes:
+            proxy = client.create_proxy(database, dotted_name)
+            # relations read through JSON-RPC are unicode, which type()
+            # does not accept
+            klass = MetaBrowser(str(dotted_name), (Browse,),
+                                {'proxy': proxy,
+                                 'client': client,
+                                 'identity_map': client.identity_map,
+                                 'float_conversion': client.float_conversion,
+                                 'compact': client.compact})
+
+            classes[(database, dotted_name)] = klass
+        return classes[(database, dotted_name)]
 
 
 
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import re
+
+from oesocket import ERPError
+
+
+class Capabilities(object):
+    """What the server of a client supports
+
+    The server version is asked once, the availability of the ORM methods
+    below is derived from it. A method found missing when called is
+    remembered as unsupported.
+    """
+
+    # first server version providing each ORM method
+    methods = {'search_count': (5, 0),
+               'export_data': (5, 0),
+               'read_group': (6, 0),
+               'load': (7, 0),
+               'search_read': (8, 0)}
+
+    def __init__(self, oe_conn):
+        self.oe_conn = oe_conn
+        self._version = None
+        self._unsupported = set()
+
+    @property
+    def version(self):
+        "Server version as returned by OEConnection.server_version"
+        if self._version is None:
+            self._version = self.oe_conn.server_version()
+        return self._version
+
+    @property
+    def version_info(self):
+        "Server version as a tuple of integers, (0,) if it can not be parsed"
+        info = []
+        for part in self.version:
+            match = re.match(r'\d+', part)
+            if match is None:
+                break
+            info.append(int(match.group()))
+            if match.group() != part:
+                break
+        return tuple(info) or (0,)
+
+    def has(self, method):
+        if method in self._unsupported:
+            return False
+        return self.version_info >= self.methods.get(method, (0,))
+
+    def call(self, method, fast, fallback):
+        """Return fast() if the server provides method, fallback() otherwise
+
+        fast() failing because method does not exist on the server is
+        remembered and fallback() is returned instead.
+        """
+        if self.has(method):
+            try:
+                return fast()
+            except ERPError as exc:
+                if "has no attribute '%s'" % method not in exc.traceback:
+                    raise
+                self._unsupported.add(method)
+        return fallback()
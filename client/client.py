@@ -4,8 +4,14 @@ import time
 import os
 
 from view import ViewFactory
-from browse import BrowseFactory
-from oesocket import OEConnection
+from browse import BrowseFactory, FLOAT_CONVERSIONS
+from capabilities import Capabilities
+from identitymap import IdentityMap
+from metrics import Metrics
+from oesocket import OEConnectionPool
+from unitofwork import UnitOfWork
+from schema import SchemaCache
+from transport import TRANSPORTS, RecordingTransport
 
 
 class DBExistError(Exception):
@@ -14,12 +20,15 @@ class DBExistError(Exception):
 
 class ProxyObj(object):
 
-    def __init__(self, model, db, credentials, context, oe_conn):
+    def __init__(self, model, db, credentials, context, oe_conn, schema=None,
+                 capabilities=None):
         self.cnx = oe_conn
         self.model = model
         self.database = db
         self.context = context
         self.credentials = credentials
+        self.schema = schema
+        self.capabilities = capabilities
 
     @property
     def uid(self):
@@ -33,34 +42,79 @@ class ProxyObj(object):
     def connected(self):
         return self.uid and self.password
 
+    @property
+    def lang(self):
+        return self.context and self.context.get('lang')
+
     def exec_workflow(self, obj_id, transition):
         assert self.uid and self.password
-        self.cnx.send(('object', 'exec_workflow', self.database, self.uid,
-                       self.password, self.model, transition, obj_id))
-        return self.cnx.receive()
+        return self.cnx.execute(('object', 'exec_workflow', self.database,
+                                 self.uid, self.password, self.model,
+                                 transition, obj_id))
 
     def name_search(self, name='', args=None, operator='ilike', limit=80):
         message = (('object', 'execute', self.database, self.uid,
                     self.password, self.model, 'name_search', name, args,
                     operator, self.context.as_dict(), limit))
-        self.cnx.send(message)
-        return self.cnx.receive()
+        return self.cnx.execute(message)
 
     def read(self, ids, fields=[]):
         return self.__getattr__('read')(ids, fields)
 
+    def fields_get(self, fields=None):
+        fields_get = self.__getattr__('fields_get')
+        if fields or self.schema is None:
+            return fields_get(fields or [])
+        return self.schema.get(self.database, 'fields_get', self.model,
+                               self.lang, lambda: fields_get([]))
+
     def fields_view_get(self, view_id=None, view_form='form'):
-        message = (('object', 'execute', self.database, self.uid,
-                    self.password, self.model, 'fields_view_get', view_id,
-                    view_form, self.context.as_dict()))
-        self.cnx.send(message)
-        return self.cnx.receive()
+        def fetch():
+            message = (('object', 'execute', self.database, self.uid,
+                        self.password, self.model, 'fields_view_get', view_id,
+                        view_form, self.context.as_dict()))
+            return self.cnx.execute(message)
+        if self.schema is None:
+            return fetch()
+        return self.schema.get(self.database, 'fields_view_get', self.model,
+                               (view_id, view_form, self.lang), fetch)
 
     def search(self, condition=None, offset=0, limit=None, order_by=None):
         if condition is None:
             condition = []
         return self.__getattr__('search')(condition, offset, limit, order_by)
 
+    def search_read(self, condition=None, fields=None, offset=0, limit=None,
+                    order_by=None):
+        """Return the values of the records matching condition
+
+        Uses the server's search_read if any, a search followed by a read
+        otherwise.
+        """
+        if condition is None:
+            condition = []
+        fields = fields or []
+
+        def search_read():
+            return self.__getattr__('search_read')(condition, fields, offset,
+                                                   limit, order_by)
+
+        def search_then_read():
+            ids = self.search(condition, offset, limit, order_by)
+            if not ids:
+                return []
+            if fields == ['id']:
+                # e.g. pages of ids, the read would not tell anything more
+                return [{'id': id} for id in ids]
+            values = dict((record_values['id'], record_values)
+                          for record_values in self.read(ids, fields))
+            return [values[id] for id in ids if id in values]
+
+        if self.capabilities is None:
+            return search_then_read()
+        return self.capabilities.call('search_read', search_read,
+                                      search_then_read)
+
     def __getattr__(self, name):
         def proxy(*attrs):
             assert self.uid and self.password
@@ -70,8 +124,7 @@ class ProxyObj(object):
             message = (('object', 'execute', self.database, self.uid,
                         self.password, self.model, name)
                        + attrs + context)
-            self.cnx.send(message)
-            return self.cnx.receive()
+            return self.cnx.execute(message)
         return proxy
 
     def __str__(self):
@@ -94,14 +147,13 @@ class WizardProxy(object):
         self.fields = {}
 
     def create(self):
-        self.cnx.send(('wizard', 'create', self.db_name, self.uid,
-                       self.password, self.wiz_name))
-        return self.cnx.receive()
+        return self.cnx.execute(('wizard', 'create', self.db_name, self.uid,
+                                 self.password, self.wiz_name))
 
     def activate_state(self, state):
-        self.cnx.send(('wizard', 'execute', self.db_name, self.uid,
-                       self.password, self.wiz_id, self.data, state))
-        response = self.cnx.receive()
+        response = self.cnx.execute(('wizard', 'execute', self.db_name,
+                                     self.uid, self.password, self.wiz_id,
+                                     self.data, state))
         self.data.setdefault('form', {}).update(response['datas'])
 
         if response['type'] == 'form':
@@ -152,29 +204,100 @@ class Context(dict):
 
     def reload(self, database, user, password):
         self.clear()
-        self.cnx.send(('object', 'execute', database, user, password,
-                       'res.users', 'context_get'))
-        self.update(self.cnx.receive() or {})
+        self.update(self.cnx.execute(('object', 'execute', database, user,
+                                      password, 'res.users', 'context_get'))
+                    or {})
 
 
 class OEClient(object):
 
-    def __init__(self, host='localhost', port=8070):
+    def __init__(self, host='localhost', port=None, pool_size=4,
+                 idle_timeout=60, schema_cache=None, identity_map=None,
+                 compression_threshold=None, transport='netrpc',
+                 record=None, float_conversion='decimal', compact=False,
+                 schema_check=True):
+        """
+        :param port: by default 8070 for NetRPC and 8069 otherwise
+        :param pool_size: maximum number of connections opened at once, the
+                          threads using the client share them
+        :param idle_timeout: seconds after which an idle connection is closed
+        :param schema_cache: directory where models and views definitions
+                             are cached, True for the default one (see
+                             SchemaCache)
+        :param schema_check: whether the schema cache is checked against the
+                             server version and installed modules, False to
+                             trust it and make no round trip for the cached
+                             models
+        :param identity_map: IdentityMap shared by the Browse classes of the
+                             client, True for an unbounded one
+        :param compression_threshold: size in bytes from which messages are
+                                      compressed if the server accepts it
+                                      (see OEConnection)
+        :param transport: 'netrpc', 'xmlrpc', 'jsonrpc' or a transport
+                          object (see oersted.transport), e.g. a
+                          ReplayTransport
+        :param record: file to which messages and replies are recorded
+                       (see RecordingTransport)
+        :param float_conversion: how Browse classes convert float fields,
+                                 'decimal', 'float' or 'fixed' (see
+                                 FloatDescriptor)
+        :param compact: whether Browse instances use the compact storage
+                        meant for many records (see Browse)
+
+        The calls made through the transport are measured in metrics (see
+        oersted.metrics).
+        """
+        if float_conversion not in FLOAT_CONVERSIONS:
+            raise ValueError(float_conversion)
         self.host = host
-        self.port = port
+        self.float_conversion = float_conversion
+        self.compact = compact
         self.credentials = Credentials()
-        self.oe_conn = OEConnection(self.host, self.port, self.credentials)
+        self.metrics = Metrics()
+        if isinstance(transport, basestring):
+            klass, default_port = TRANSPORTS[transport]
+            self.port = port or default_port
+            if klass is OEConnectionPool:
+                self.oe_conn = OEConnectionPool(
+                    self.host, self.port, self.credentials,
+                    max_size=pool_size, idle_timeout=idle_timeout,
+                    compression_threshold=compression_threshold,
+                    metrics=self.metrics)
+            else:
+                self.oe_conn = klass(self.host, self.port,
+                                     pool_size=pool_size, metrics=self.metrics)
+        else:
+            self.port = port
+            self.oe_conn = transport
+            if hasattr(transport, 'metrics'):
+                if transport.metrics is None:
+                    transport.metrics = self.metrics
+                self.metrics = transport.metrics
+        if record is not None:
+            self.oe_conn = RecordingTransport(self.oe_conn, record)
         self.context = Context(self.oe_conn)
+        self.capabilities = Capabilities(self.oe_conn)
+        self.schema_cache = None
+        if schema_cache:
+            self.schema_cache = SchemaCache(
+                self, None if schema_cache is True else schema_cache,
+                check=schema_check)
+        if identity_map is True:
+            identity_map = IdentityMap()
+        self.identity_map = identity_map
+        self.browse_classes = {} # by database and model, see BrowseFactory
 
     def execute(self, command):
-        self.oe_conn.send(command)
-        return self.oe_conn.receive()
+        return self.oe_conn.execute(command)
+
+    def close(self):
+        "Closes the idle connections to the server"
+        self.oe_conn.close()
 
     def get_object_reference(self, database, module, name):
-        server_version = self.oe_conn.server_version()
         data_obj = self.create_proxy(database, 'ir.model.data', context=False)
 
-        if server_version[0] == '5':
+        if self.capabilities.version[0] == '5':
             model_id = data_obj._get_id(module, name)
             data = data_obj.read(model_id, ['model', 'res_id'])
             return data['model'], int(data['res_id'])
@@ -207,11 +330,15 @@ class OEClient(object):
     def create_proxy(self, db, object, context=True):
         context = context and self.context or None
         return ProxyObj(object, db, self.credentials[db], context,
-                        self.oe_conn)
+                        self.oe_conn, self.schema_cache, self.capabilities)
 
     def create_browse(self, db, object):
         BrowseFactory._client = self
-        return BrowseFactory.get(db, object)
+        return BrowseFactory.get(db, object, self)
+
+    def unit_of_work(self):
+        "Return a UnitOfWork to batch the Browse.save calls of a with block"
+        return UnitOfWork()
 
     def create_wizard(self, db, wizard_name):
         return WizardProxy(wizard_name, db, self.credentials[db], self.oe_conn,
@@ -224,15 +351,25 @@ class OEClient(object):
         if not isinstance(view_id, basestring):
             raise TypeError
         module, view_name = view_id.split('.')
-        (model, data_id) = self.get_object_reference(db, module, view_name)
-        assert model == 'ir.ui.view'
-
-        view_proxy = self.create_proxy(db, 'ir.ui.view')
-        view_info = view_proxy.read(data_id)
-        server_version = self.oe_conn.server_version()
-        if server_version[0] == '5':
-            view_info = view_info[0]
-        return ViewFactory.get(self, db, view_info['model'], data_id)
+
+        def lookup():
+            (model, data_id) = self.get_object_reference(db, module,
+                                                         view_name)
+            assert model == 'ir.ui.view'
+
+            view_proxy = self.create_proxy(db, 'ir.ui.view')
+            view_info = view_proxy.read(data_id, ['model'])
+            if self.capabilities.version[0] == '5':
+                view_info = view_info[0]
+            return view_info['model'], data_id
+
+        if self.schema_cache is None:
+            model, data_id = lookup()
+        else:
+            model, data_id = self.schema_cache.get(db, 'view_ref',
+                                                   'ir.ui.view', view_id,
+                                                   lookup)
+        return ViewFactory.get(self, db, model, data_id)
 
     def login(self, db=None, user=None, password=None):
         """
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""Generation of modules of static Browse classes
+
+BrowseFactory builds the Browse class of a model the first time it is used,
+with a fields_get round trip and the work of MetaBrowser. This module writes
+these classes once to an importable module, with the fields definitions,
+descriptors and relations baked in, for the processes started often or in
+large numbers::
+
+    python -m oersted.codegen -d demo -o models.py res.partner res.users
+
+Importing the module makes no RPC, register() makes client.create_browse
+return its classes::
+
+    >>> import models
+    >>> models.register(client, 'demo')
+    >>> models.ResPartner.search([('customer', '=', True)])
+
+register() compares the server version and the installed modules with the
+ones the module was generated from and warns with a SchemaDriftWarning if
+they differ, check=False skips it to make no RPC at all. The models not in
+the module are built at runtime as usual.
+"""
+
+import argparse
+import keyword
+import os
+import pprint
+import re
+import sys
+import warnings
+
+from browse import BrowseFactory, MetaBrowser, DefaultDescriptor
+from schema import SchemaCache
+
+
+class SchemaDriftWarning(UserWarning):
+    pass
+
+
+class StaticBrowser(MetaBrowser):
+    "Metaclass of the generated classes, their fields are set by the module"
+
+    def __init__(cls, klassname, bases, properties):
+        super(MetaBrowser, cls).__init__(klassname, bases, {})
+
+
+def class_name(model, taken=()):
+    "Return a class name for model, e.g. ResPartner for res.partner"
+    name = ''.join(part[:1].upper() + part[1:]
+                   for part in re.split(r'[^a-zA-Z0-9]+', model))
+    if not name or name[0].isdigit():
+        name = 'Model' + name
+    klassname, rank = name, 1
+    while klassname in taken:
+        rank += 1
+        klassname = '%s%d' % (name, rank)
+    return klassname
+
+
+def _identifier(name):
+    return (re.match(r'^[a-zA-Z][a-zA-Z0-9_]*$', name) is not None
+            and not keyword.iskeyword(name))
+
+
+def _class_source(klassname, model, fields, compact):
+    lines = ['class %s(Browse):' % klassname,
+             '    __metaclass__ = StaticBrowser']
+    if compact:
+        lines.append('    __slots__ = ()')
+    positions = dict((name, position) for position, name
+                     in enumerate(['id'] + sorted(fields)))
+    eager_fields = sorted(name for name, field_def in fields.items()
+                          if name != 'id' and MetaBrowser.eager(field_def))
+    lines += ['    _model = %r' % model,
+              '    _proxy = None',
+              '    _compact = %r' % compact,
+              '    _fields = %s' % pprint.pformat(fields).replace(
+                  '\n', '\n' + ' ' * 14),
+              '    _positions = %s' % pprint.pformat(positions).replace(
+                  '\n', '\n' + ' ' * 17),
+              '    _eager_fields = %s' % pprint.pformat(eager_fields).replace(
+                  '\n', '\n' + ' ' * 20),
+              '']
+    others = []
+    for name in sorted(fields):
+        if name == 'id':
+            continue
+        descriptor = MetaBrowser.descriptors.get(fields[name]['type'],
+                                                 DefaultDescriptor).__name__
+        if _identifier(name):
+            lines.append('    %s = %s(%r, _fields[%r])' % (name, descriptor,
+                                                           name, name))
+        else:
+            # not usable as a name in the class body
+            others.append('setattr(%s, %r, %s(%r, %s._fields[%r]))'
+                          % (klassname, str(name), descriptor, name,
+                             klassname, name))
+    return '\n'.join(lines + [''] + others)
+
+
+def generate(client, database, models, compact=False):
+    """Return the source of a module with the Browse classes of models
+
+    :param compact: whether the classes use the compact storage (see Browse)
+    """
+    schema = client.schema_cache or SchemaCache(client)
+    signature = schema.server_signature(database)
+    classes = []
+    for model in models:
+        proxy = client.create_proxy(database, model)
+        classes.append((class_name(model, [klass[0] for klass in classes]),
+                        model, proxy.fields_get([])))
+    source = ['# -*- coding: utf-8 -*-',
+              '"""Browse classes generated by oersted.codegen from %s:%s %s'
+              % (client.host, client.port, database),
+              '',
+              'Regenerate the module when the installed modules change.',
+              '"""',
+              '',
+              'from oersted.browse import Browse, DefaultDescriptor, '
+              'FloatDescriptor, \\',
+              '    M2ODescriptor, O2MDescriptor, DTDescriptor, DDescriptor',
+              'from oersted import codegen',
+              'from oersted.codegen import StaticBrowser',
+              '',
+              '# server version and signature of the installed modules',
+              'SIGNATURE = %r' % (signature,),
+              '']
+    for klassname, model, fields in classes:
+        source += ['', _class_source(klassname, model, fields, compact), '']
+    source += ['',
+               'MODELS = {%s}' % ',\n          '.join(
+                   '%r: %s' % (model, klassname)
+                   for klassname, model, _ in classes),
+               '',
+               '',
+               'def register(client, database, check=True):',
+               '    "Make client.create_browse return the classes of this '
+               'module for database"',
+               '    codegen.register(client, database, MODELS, SIGNATURE, '
+               'check)',
+               '']
+    return '\n'.join(source)
+
+
+def register(client, database, models, signature, check=True):
+    """Bind the generated classes of models to database of client
+
+    models maps model names to classes. A class is bound to the first
+    client and database it is registered for, a subclass is bound to the
+    others.
+    """
+    if check:
+        schema = client.schema_cache or SchemaCache(client)
+        server_signature = schema.server_signature(database)
+        if tuple(server_signature) != tuple(signature):
+            warnings.warn('the Browse classes of %s were generated for %s, '
+                          'the server is now at %s, regenerate them with '
+                          'python -m oersted.codegen'
+                          % (database, signature, server_signature),
+                          SchemaDriftWarning, stacklevel=3)
+    BrowseFactory._client = client
+    for model, klass in models.items():
+        if klass._proxy is not None and (klass._client is not client
+                                         or klass._proxy.database != database):
+            klass = type(klass)(klass.__name__, (klass,),
+                                {'__slots__': ()} if klass._compact else {})
+        klass.proxy = klass._proxy = client.create_proxy(database, model)
+        klass._client = client
+        klass._identity_map = client.identity_map
+        klass._float_conversion = client.float_conversion
+        client.browse_classes[(database, model)] = klass
+
+
+def main():
+    from client import OEClient
+    from transport import TRANSPORTS
+    parser = argparse.ArgumentParser(
+        description='Write a module of Browse classes for models')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--transport', default='netrpc',
+                        choices=sorted(TRANSPORTS))
+    parser.add_argument('-d', '--database',
+                        default=os.environ.get('OERP_DATABASE', 'demo'))
+    parser.add_argument('-u', '--user')
+    parser.add_argument('-p', '--password')
+    parser.add_argument('-o', '--output',
+                        help='file written, the standard output by default')
+    parser.add_argument('--compact', action='store_true',
+                        help='make classes using the compact storage')
+    parser.add_argument('models', nargs='*',
+                        help='models of the module, all by default')
+    args = parser.parse_args()
+
+    client = OEClient(args.host, args.port, transport=args.transport)
+    if not client.login(args.database, args.user, args.password):
+        parser.error('login to %s failed' % args.database)
+    models = args.models
+    if not models:
+        model_obj = client.create_proxy(args.database, 'ir.model')
+        models = sorted(values['model'] for values in model_obj.read(
+            model_obj.search([]), ['model']))
+    source = generate(client, args.database, models, args.compact)
+    client.close()
+    if args.output is None:
+        sys.stdout.write(source)
+    else:
+        with open(args.output, 'w') as output:
+            output.write(source)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""Bulk reads of fields into columns, see Browse.to_columns
+
+With NumPy, columns are arrays:
+
+- float: float64, nan for empty values
+- integer: int64, boolean: bool
+- many2one: int64 ids, 0 for empty values
+- date: datetime64[D], datetime: datetime64[s], NaT for empty values
+- others (char, selection, one2many, ...): object arrays of the values
+  read, None for empty values
+
+Without NumPy, columns are lists of the same values, dates being left as
+the strings sent by the server.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+NAN = float('nan')
+
+
+def _float(values):
+    return [NAN if value is False or value is None else value
+            for value in values]
+
+
+def _integer(values):
+    return [value or 0 for value in values]
+
+
+def _many2one(values):
+    return [value[0] if value else 0 for value in values]
+
+
+def _date(values):
+    return [value or None for value in values]
+
+
+def _other(values):
+    return [None if value is False else value for value in values]
+
+
+# type -> (conversion of the values, NumPy dtype)
+CONVERSIONS = {'float': (_float, 'float64'),
+               'integer': (_integer, 'int64'),
+               'boolean': (_integer, 'bool'),
+               'many2one': (_many2one, 'int64'),
+               'date': (_date, 'datetime64[D]'),
+               'datetime': (_date, 'datetime64[s]')}
+
+
+def _column(values, field_type):
+    convert, dtype = CONVERSIONS.get(field_type, (_other, 'object'))
+    values = convert(values)
+    if numpy is None:
+        return values
+    if dtype.startswith('datetime64'):
+        values = ['NaT' if value is None else value for value in values]
+    elif dtype == 'object':
+        # lists of one2many ids must not become a 2d array
+        column = numpy.empty(len(values), dtype=object)
+        column[:] = values
+        return column
+    return numpy.array(values, dtype=dtype)
+
+
+def _batches(klass, fields, ids, domain, batch_size):
+    "Yield the values of the records, batch_size at a time"
+    if ids is None:
+        for values in klass._pages(list(domain or []), fields, batch_size):
+            yield values
+        return
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        values = dict((record_values['id'], record_values)
+                      for record_values in klass._proxy.read(batch, fields))
+        yield [values[id] for id in batch if id in values]
+
+
+def to_columns(klass, fields, ids=None, domain=None, batch_size=1000):
+    """Return the values of fields of the records of klass by field name,
+    with their ids under 'id'
+
+    The records are the ones of ids if given, the ones matching domain
+    otherwise, an empty domain meaning all the records.
+    """
+    if ids is not None and domain is not None:
+        raise ValueError('ids and domain can not be given together')
+    fields = [name for name in fields if name != 'id']
+    types = dict((name, klass._fields[name]['type']) for name in fields)
+    chunks = dict((name, []) for name in ['id'] + fields)
+    for values in _batches(klass, fields, ids, domain, batch_size):
+        chunks['id'].append(_column([record_values['id']
+                                     for record_values in values],
+                                    'integer'))
+        for name in fields:
+            chunks[name].append(_column([record_values[name]
+                                         for record_values in values],
+                                        types[name]))
+    columns = {}
+    for name, parts in chunks.items():
+        if numpy is None:
+            columns[name] = [value for part in parts for value in part]
+        elif parts:
+            columns[name] = numpy.concatenate(parts)
+        else:
+            columns[name] = _column([], types.get(name, 'integer'))
+    return columns
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""Streaming CSV export, see Browse.export_csv
+
+Columns are field paths as for export_data, e.g. 'name' or
+'partner_id/country_id/code'. As with export_data, 'id' gives the external
+id of the records and '.id' their database id. Records are exported by
+batches, with export_data on servers providing it and with reads otherwise.
+In that case the related records of a batch are read together for each
+relational field of the paths, many2one fields give their name and
+one2many fields their values joined by commas. Unlike export_data, reads
+do not make external ids for the records lacking one, their 'id' is empty.
+"""
+
+import csv
+
+from browse import BrowseFactory
+
+
+def _tree(paths):
+    "Return the paths as nested dicts of field names"
+    tree = {}
+    for path in paths:
+        node = tree
+        for name in path.split('/'):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def _xml_ids(klass, ids):
+    "Return the external ids of the records of klass by database id"
+    if not ids:
+        return {}
+    data_obj = klass._client.create_proxy(klass._proxy.database,
+                                          'ir.model.data')
+    return dict((values['res_id'], '%s.%s' % (values['module'],
+                                              values['name']))
+                for values in data_obj.search_read(
+                    [('model', '=', klass._proxy.model),
+                     ('res_id', 'in', list(ids))],
+                    ['module', 'name', 'res_id']))
+
+
+def _resolve(klass, records, tree):
+    """Read the related records and external ids needed by tree for the
+    values of records, store them under 'field/' and 'id/' in the values"""
+    if 'id' in tree:
+        xml_ids = _xml_ids(klass, [values['id'] for values in records])
+        for values in records:
+            values['id/'] = xml_ids.get(values['id'], '')
+    for name, subtree in tree.items():
+        if name in ('id', '.id') or not set(subtree) - set(['.id']):
+            # the database ids are in the values already
+            continue
+        field_def = klass._fields[name]
+        related_klass = BrowseFactory.get(klass._proxy.database,
+                                          field_def['relation'], klass._client)
+        ids = set()
+        for values in records:
+            value = values.get(name)
+            if field_def['type'] == 'many2one':
+                if value:
+                    ids.add(value[0])
+            else:
+                ids.update(value or [])
+        fields = [sub for sub in subtree if sub not in ('id', '.id')]
+        if not ids:
+            related = []
+        elif fields:
+            related = related_klass._proxy.read(list(ids), fields)
+        else:
+            # only the external ids are needed
+            related = [{'id': id} for id in ids]
+        _resolve(related_klass, related, subtree)
+        related = dict((values['id'], values) for values in related)
+        for values in records:
+            value = values.get(name)
+            if field_def['type'] == 'many2one':
+                values[name + '/'] = related.get(value[0]) if value else None
+            else:
+                values[name + '/'] = [related[id] for id in value or []
+                                      if id in related]
+
+
+def _cell(klass, values, names):
+    "Return the value of the path names from the values of a record"
+    name = names[0]
+    if name == '.id':
+        return values['id']
+    elif name == 'id':
+        return values['id/']
+    field_def = klass._fields[name]
+    value = values.get(name)
+    if len(names) > 1 and names[1:] != ['.id']:
+        related = values.get(name + '/')
+        related_klass = BrowseFactory.get(klass._proxy.database,
+                                          field_def['relation'], klass._client)
+        if field_def['type'] == 'many2one':
+            if related is None:
+                return ''
+            return _cell(related_klass, related, names[1:])
+        return ','.join(unicode(_cell(related_klass, item, names[1:]))
+                        for item in related)
+    elif len(names) > 1:
+        # database ids of the related records
+        if field_def['type'] == 'many2one':
+            return value[0] if value else ''
+        return ','.join(str(id) for id in value or [])
+    elif field_def['type'] == 'boolean':
+        return bool(value)
+    elif field_def['type'] == 'many2one':
+        return value[1] if value else ''
+    elif field_def['type'] in ('one2many', 'many2many'):
+        return ','.join(str(id) for id in value or [])
+    elif value is False or value is None:
+        return ''
+    return value
+
+
+def _encode(value, encoding):
+    if isinstance(value, unicode):
+        return value.encode(encoding)
+    elif value is False or value is None:
+        return ''
+    return value
+
+
+def _rows(klass, fields, condition, batch_size, offset):
+    """Yield the number of records and their rows, a batch at a time
+
+    export_data may give several rows to a record for its one2many fields.
+    """
+    proxy = klass._proxy
+    tree = _tree(fields)
+    read_fields = [name for name in tree if name not in ('id', '.id')] \
+        or ['id']
+    paths = [path.split('/') for path in fields]
+    exporting = proxy.capabilities.has('export_data')
+    for values in klass._pages(condition,
+                               ['id'] if exporting else read_fields,
+                               batch_size, offset=offset):
+        ids = [record_values['id'] for record_values in values]
+        if exporting:
+            rows = proxy.capabilities.call(
+                'export_data',
+                lambda: proxy.export_data(ids, fields)['datas'],
+                lambda: None)
+            if rows is not None:
+                yield len(ids), rows
+                continue
+            # the server does not provide export_data after all
+            exporting = False
+            values = dict((record_values['id'], record_values)
+                          for record_values in proxy.read(ids, read_fields))
+            values = [values[id] for id in ids if id in values]
+        _resolve(klass, values, tree)
+        yield len(values), [[_cell(klass, record_values, names)
+                             for names in paths]
+                            for record_values in values]
+
+
+def export_csv(klass, output, fields, condition=None, batch_size=1000,
+               offset=0, progress=None, header=True, encoding='utf-8'):
+    """Write the fields of the records of klass matching condition to output
+    and return the number of records written
+
+    output is a file object or a path. Records are exported by id, offset
+    skips the first ones, e.g. the ones written by an interrupted export:
+    rows are then appended to a path and the header is not written again.
+    progress is called with the number of records written, offset included,
+    and the number of records to write after each batch.
+    """
+    condition = list(condition or [])
+    close = isinstance(output, basestring)
+    if close:
+        output = open(output, 'ab' if offset else 'wb')
+    try:
+        writer = csv.writer(output)
+        if header and not offset:
+            writer.writerow([_encode(name, encoding) for name in fields])
+        total = klass.count(condition) if progress is not None else None
+        done = offset
+        for count, rows in _rows(klass, fields, condition, batch_size,
+                                 offset):
+            writer.writerows([[_encode(value, encoding) for value in row]
+                              for row in rows])
+            done += count
+            if progress is not None:
+                progress(done, total)
+    finally:
+        if close:
+            output.close()
+    return done - offset
@@ -0,0 +1,572 @@
+# -*- coding: utf-8 -*-
+"""In-process stand-in for an OpenERP server
+
+It serves the same models over NetRPC, XML-RPC and JSON-RPC, which is
+enough to benchmark or try the client without a real server::
+
+    >>> server = FakeServer()
+    >>> server.start()
+    >>> client = OEClient('127.0.0.1', server.netrpc_port)
+    >>> client.login(server.database, 'admin', 'admin')
+
+add_synthetic_model adds models of any size, latency delays every call and
+calls, received and sent count what the server was asked.
+"""
+
+import BaseHTTPServer
+import collections
+import cPickle
+import datetime
+import json
+import operator
+import SocketServer
+import threading
+import time
+import traceback
+import xmlrpclib
+import zlib
+
+OPERATORS = {'=': operator.eq,
+             '!=': operator.ne,
+             '<': operator.lt,
+             '>': operator.gt,
+             '<=': operator.le,
+             '>=': operator.ge,
+             'in': lambda value, values: value in values,
+             'not in': lambda value, values: value not in values,
+             'like': lambda value, pattern: pattern in (value or ''),
+             'ilike': lambda value, pattern: (pattern.lower()
+                                              in (value or '').lower())}
+
+
+class FakeModel(object):
+    """A model whose records are held in a dict
+
+    Records store many2one fields as an id, one2many fields are computed
+    from the relation_field of their definition.
+    """
+
+    def __init__(self, server, name, fields, records=()):
+        self.server = server
+        self.name = name
+        self.fields = fields
+        self.records = {}
+        self.next_id = 1
+        for values in records:
+            self.create(values)
+
+    def _children(self, name):
+        "Return the ids of the records of one2many name by parent id"
+        field_def = self.fields[name]
+        children = {}
+        for related_id, values in sorted(
+                self.server.models[field_def['relation']].records.items()):
+            parent_id = values.get(field_def['relation_field'])
+            if parent_id:
+                children.setdefault(parent_id, []).append(related_id)
+        return children
+
+    def _value(self, record, name, children=None):
+        field_def = self.fields[name]
+        if field_def['type'] == 'many2one':
+            related_id = record.get(name)
+            if not related_id:
+                return False
+            related = self.server.models[field_def['relation']]
+            return (related_id,
+                    related.records[related_id].get('name', u''))
+        elif field_def['type'] in ('one2many', 'many2many'):
+            if 'relation_field' not in field_def:
+                return list(record.get(name) or [])
+            if children is None:
+                children = self._children(name)
+            return list(children.get(record['id'], []))
+        return record.get(name, False)
+
+    def _match(self, record, domain):
+        for name, op, value in domain:
+            if name == 'id':
+                record_value = record['id']
+            else:
+                record_value = self._value(record, name)
+                if isinstance(record_value, tuple):
+                    record_value = record_value[0]
+            if not OPERATORS[op](record_value, value):
+                return False
+        return True
+
+    def _convert(self, values, record_id):
+        "Apply the one2many commands of the values of record_id"
+        values = dict(values)
+        for name, value in values.items():
+            field_def = self.fields.get(name, {})
+            if field_def.get('type') not in ('one2many', 'many2many') \
+                    or not value or not isinstance(value[0], (list, tuple)):
+                continue
+            related = self.server.models[field_def['relation']]
+            values[name] = []
+            for command in value:
+                if command[0] == 0:
+                    child = dict(command[2])
+                    if 'relation_field' in field_def:
+                        child[field_def['relation_field']] = record_id
+                    values[name].append(related.create(child))
+                elif command[0] == 1:
+                    related.write([command[1]], command[2])
+                    values[name].append(command[1])
+                elif command[0] == 2:
+                    related.unlink([command[1]])
+                elif command[0] == 4:
+                    values[name].append(command[1])
+                elif command[0] == 6:
+                    values[name] = list(command[2])
+        return values
+
+    def search(self, args, offset=0, limit=None, order=None, context=None,
+               count=False):
+        records = [record for record in self.records.values()
+                   if self._match(record, args or [])]
+        for clause in reversed((order or 'id').split(',')):
+            parts = clause.split()
+            records.sort(key=lambda record: record.get(parts[0]),
+                         reverse=parts[-1].lower() == 'desc')
+        ids = [record['id'] for record in records][offset or 0:]
+        if limit:
+            ids = ids[:limit]
+        if count:
+            return len(ids)
+        return ids
+
+    def search_count(self, args, context=None):
+        return self.search(args, count=True)
+
+    def read(self, ids, fields=None, context=None):
+        single = isinstance(ids, (int, long))
+        result = []
+        fields = [name for name in fields or self.fields.keys()
+                  if name in self.fields]
+        children = dict((name, self._children(name)) for name in fields
+                        if 'relation_field' in self.fields[name])
+        for record_id in [ids] if single else ids:
+            record = self.records.get(record_id)
+            if record is None:
+                continue
+            values = {'id': record_id}
+            for name in fields:
+                values[name] = self._value(record, name, children.get(name))
+            result.append(values)
+        if single:
+            return result[0] if result else {}
+        return result
+
+    def search_read(self, domain=None, fields=None, offset=0, limit=None,
+                    order=None, context=None):
+        return self.read(self.search(domain, offset, limit, order), fields)
+
+    def create(self, vals, context=None):
+        record_id = self.next_id
+        self.next_id += 1
+        self.records[record_id] = self._convert(vals, record_id)
+        self.records[record_id]['id'] = record_id
+        return record_id
+
+    def write(self, ids, vals, context=None):
+        for record_id in ids:
+            self.records[record_id].update(self._convert(vals, record_id))
+        return True
+
+    def unlink(self, ids, context=None):
+        for record_id in ids:
+            self.records.pop(record_id, None)
+        return True
+
+    def load(self, fields, data, context=None):
+        ids = []
+        for row in data:
+            values = {}
+            for name, value in zip(fields, row):
+                if name.endswith('/.id'):
+                    values[name[:-len('/.id')]] = int(value) if value \
+                        else False
+                elif self.fields[name]['type'] == 'float':
+                    values[name] = float(value or 0)
+                elif self.fields[name]['type'] == 'integer':
+                    values[name] = int(value or 0)
+                elif self.fields[name]['type'] == 'boolean':
+                    values[name] = value == '1'
+                else:
+                    values[name] = value or False
+            ids.append(self.create(values))
+        return {'ids': ids, 'messages': []}
+
+    def _xml_id(self, record_id):
+        "Return the external id of a record, making one if it has none"
+        data = self.server.models['ir.model.data']
+        data_ids = data.search([('model', '=', self.name),
+                                ('res_id', '=', record_id)])
+        if data_ids:
+            values = data.read(data_ids[:1], ['module', 'name'])[0]
+            return '%s.%s' % (values['module'], values['name'])
+        xml_id = '__export__.%s_%d' % (self.name.replace('.', '_'),
+                                       record_id)
+        self.server.add_xml_id(xml_id, self.name, record_id)
+        return xml_id
+
+    def _export(self, record_id, names):
+        "Return the value of the path names, joining one2many values"
+        name = names[0]
+        if name == '.id':
+            return record_id
+        elif name == 'id':
+            return self._xml_id(record_id)
+        field_def = self.fields[name]
+        value = self._value(self.records[record_id], name)
+        if len(names) > 1:
+            related = self.server.models[field_def['relation']]
+            if field_def['type'] == 'many2one':
+                return related._export(value[0], names[1:]) if value else ''
+            return ','.join(unicode(related._export(related_id, names[1:]))
+                            for related_id in value)
+        elif field_def['type'] == 'many2one':
+            return value[1] if value else ''
+        elif field_def['type'] in ('one2many', 'many2many'):
+            return ','.join(str(related_id) for related_id in value)
+        elif field_def['type'] == 'boolean':
+            return bool(value)
+        return '' if value is False else value
+
+    def export_data(self, ids, fields_to_export, context=None):
+        paths = [path.split('/') for path in fields_to_export]
+        return {'datas': [[self._export(record_id, names) for names in paths]
+                          for record_id in ids if record_id in self.records]}
+
+    def read_group(self, domain, fields, groupby, offset=0, limit=None,
+                   context=None, orderby=False):
+        if isinstance(groupby, basestring):
+            groupby = [groupby]
+        groups = {}
+        for values in self.read(self.search(domain), fields + groupby[:1]):
+            key = values[groupby[0]]
+            group = groups.setdefault(key, {
+                groupby[0]: key, '%s_count' % groupby[0]: 0,
+                '__domain': domain + [(groupby[0], '=', key[0]
+                                       if isinstance(key, tuple) else key)]})
+            group['%s_count' % groupby[0]] += 1
+            for name in fields:
+                if self.fields[name]['type'] in ('integer', 'float'):
+                    group[name] = group.get(name, 0) + (values[name] or 0)
+        rows = [groups[key] for key in sorted(groups)][offset:]
+        return rows[:limit] if limit else rows
+
+    def name_search(self, name='', args=None, operator='ilike', context=None,
+                    limit=100):
+        ids = self.search((args or []) + [('name', operator, name)], 0,
+                          limit)
+        return [(record_id, self.records[record_id].get('name', u''))
+                for record_id in ids]
+
+    def fields_get(self, allfields=None, context=None):
+        return dict((name, field_def)
+                    for name, field_def in self.fields.items()
+                    if not allfields or name in allfields)
+
+    def default_get(self, fields_list, context=None):
+        return {}
+
+    def fields_view_get(self, view_id=None, view_type='form', context=None,
+                        toolbar=False):
+        arch = ''.join('<field name="%s"/>' % name
+                       for name in sorted(self.fields))
+        return {'name': self.name, 'model': self.name, 'type': view_type,
+                'view_id': view_id or 0, 'fields': self.fields_get(),
+                'arch': '<%s>%s</%s>' % (view_type, arch, view_type)}
+
+    def get_object_reference(self, module, name):
+        return self.server.xml_ids['%s.%s' % (module, name)]
+
+    def context_get(self, context=None):
+        return {'lang': 'en_US', 'tz': False}
+
+
+class FakeServer(object):
+    """Stand-in for an OpenERP server holding a single database
+
+    By default it holds res.partner records with names, amounts and a
+    parent, and the models the client itself relies on.
+    """
+
+    def __init__(self, version='6.0.4', database='demo', login='admin',
+                 password='admin', partners=100, compression=False,
+                 latency=0.0):
+        self.version = version
+        self.database = database
+        self.login = login
+        self.password = password
+        self.compression = compression # accept zlib compressed messages
+        self.latency = latency # seconds added to each call
+        self.models = {}
+        self.xml_ids = {} # 'module.name': (model, id)
+        self._lock = threading.Lock() # models are used by a thread at once
+        self.reset()
+        self.add_model('res.users', {'name': {'type': 'char'}},
+                       [{'name': u'Administrator'}])
+        self.add_model('ir.module.module',
+                       {'name': {'type': 'char'},
+                        'latest_version': {'type': 'char'},
+                        'state': {'type': 'char'}},
+                       [{'name': u'base', 'latest_version': u'6.0.1',
+                         'state': u'installed'}])
+        self.add_model('res.partner',
+                       {'name': {'type': 'char', 'string': 'Name'},
+                        'amount': {'type': 'float', 'digits': (16, 2)},
+                        'parent_id': {'type': 'many2one',
+                                      'relation': 'res.partner'},
+                        'child_ids': {'type': 'one2many',
+                                      'relation': 'res.partner',
+                                      'relation_field': 'parent_id'}},
+                       [{'name': u'Partner %d' % i, 'amount': i * 1.5,
+                         'parent_id': 1 if i > 1 else False}
+                        for i in range(1, partners + 1)])
+        self.add_model('ir.model.data', {'module': {'type': 'char'},
+                                         'name': {'type': 'char'},
+                                         'model': {'type': 'char'},
+                                         'res_id': {'type': 'integer'}})
+        self.add_model('ir.ui.view', {'name': {'type': 'char'},
+                                      'model': {'type': 'char'}})
+        self.servers = []
+        self.netrpc_port = None
+        self.http_port = None
+
+    def add_model(self, name, fields, records=()):
+        self.models[name] = FakeModel(self, name, fields, records)
+        return self.models[name]
+
+    def add_synthetic_model(self, name, size, lines=0):
+        """Add name with size records holding a field of each type
+
+        Records have a many2one to name.category (10 records with external
+        ids) and, if lines,
+        as many name.line records in their line_ids.
+        """
+        categories = self.add_model(
+            '%s.category' % name, {'name': {'type': 'char'}},
+            [{'name': u'Category %d' % i} for i in range(1, 11)])
+        for i in range(1, 11):
+            self.add_xml_id('%s.category_%d' % (name.replace('.', '_'), i),
+                            categories.name, i)
+        start = datetime.datetime(2013, 1, 1)
+        model = self.add_model(name, {
+            'name': {'type': 'char', 'size': 64},
+            'code': {'type': 'char', 'size': 16},
+            'active': {'type': 'boolean'},
+            'quantity': {'type': 'integer'},
+            'amount': {'type': 'float', 'digits': (16, 2)},
+            'date': {'type': 'date'},
+            'create_date': {'type': 'datetime'},
+            'state': {'type': 'selection',
+                      'selection': [('draft', 'Draft'), ('done', 'Done')]},
+            'description': {'type': 'text'},
+            'category_id': {'type': 'many2one',
+                            'relation': categories.name},
+            'line_ids': {'type': 'one2many', 'relation': '%s.line' % name,
+                         'relation_field': 'parent_id'},
+            'image': {'type': 'binary'}})
+        for i in xrange(1, size + 1):
+            moment = start + datetime.timedelta(hours=i)
+            model.create({'name': u'%s %d' % (name, i), 'code': 'C%06d' % i,
+                          'active': i % 7 != 0, 'quantity': i % 100,
+                          'amount': i * 1.25,
+                          'date': moment.strftime('%Y-%m-%d'),
+                          'create_date': moment.strftime('%Y-%m-%d %H:%M:%S'),
+                          'state': 'done' if i % 3 else 'draft',
+                          'description': u'Description of record %d' % i,
+                          'category_id': i % 10 + 1,
+                          'image': False})
+        self.add_model('%s.line' % name, {
+            'name': {'type': 'char'},
+            'price': {'type': 'float'},
+            'parent_id': {'type': 'many2one', 'relation': name}},
+            [{'name': u'Line %d' % i, 'price': i * 0.5,
+              'parent_id': i % size + 1} for i in xrange(lines)])
+        return model
+
+    def add_view(self, xml_id, model):
+        "Add a form view of model reachable through create_view(xml_id)"
+        view_id = self.models['ir.ui.view'].create({'name': xml_id,
+                                                    'model': model})
+        self.add_xml_id(xml_id, 'ir.ui.view', view_id)
+        return view_id
+
+    def add_xml_id(self, xml_id, model, res_id):
+        "Give xml_id ('module.name') to the record res_id of model"
+        module, name = xml_id.split('.', 1)
+        self.models['ir.model.data'].create({'module': module, 'name': name,
+                                             'model': model,
+                                             'res_id': res_id})
+        self.xml_ids[xml_id] = (model, res_id)
+
+    def reset(self):
+        "Reset the call counters"
+        self.calls = collections.Counter() # (model or service, method)
+        self.received = 0 # bytes of the requests
+        self.sent = 0 # bytes of the replies
+
+    def count(self, message, received, sent):
+        if message[:2] == ('object', 'execute'):
+            key = message[5], message[6]
+        else:
+            key = message[0], message[1]
+        with self._lock:
+            self.calls[key] += 1
+            self.received += received
+            self.sent += sent
+
+    def dispatch(self, message):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            return self._dispatch(message)
+
+    def _dispatch(self, message):
+        service, method = message[:2]
+        args = message[2:]
+        if service == 'db':
+            if method == 'server_version':
+                return self.version
+            elif method == 'list':
+                return [self.database]
+        elif service == 'common' and method == 'login':
+            database, login, password = args
+            return int(database == self.database and login == self.login
+                       and password == self.password)
+        elif service == 'object':
+            database, uid, password, model = args[:4]
+            if database != self.database or uid != 1 \
+                    or password != self.password:
+                raise Exception('AccessDenied')
+            if method == 'exec_workflow':
+                return True
+            elif method == 'execute':
+                method = args[4]
+                if method.startswith('_') or not hasattr(FakeModel, method):
+                    raise AttributeError("'%s' object has no attribute '%s'"
+                                         % (model, method))
+                return getattr(self.models[model], method)(*args[5:])
+        raise Exception('Unknown method %s.%s' % (service, method))
+
+    def start(self):
+        "Serve NetRPC and HTTP on free ports of 127.0.0.1 in threads"
+        for klass, handler in ((ThreadedTCPServer, NetRPCHandler),
+                               (ThreadedHTTPServer, HTTPHandler)):
+            server = klass(('127.0.0.1', 0), handler)
+            server.fake = self
+            thread = threading.Thread(target=server.serve_forever)
+            thread.daemon = True
+            thread.start()
+            self.servers.append(server)
+        self.netrpc_port = self.servers[0].server_address[1]
+        self.http_port = self.servers[1].server_address[1]
+        return self
+
+    def stop(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        self.servers = []
+
+
+class ThreadedTCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # clients opening many connections at once, e.g. asyncio ones
+    request_queue_size = 128
+
+
+class ThreadedHTTPServer(SocketServer.ThreadingMixIn,
+                         BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class NetRPCHandler(SocketServer.StreamRequestHandler):
+    "Serves messages on a connection until the client closes it"
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        fake = self.server.fake
+        while True:
+            header = self.rfile.read(9)
+            if len(header) < 9:
+                return
+            body = self.rfile.read(int(header[:8]))
+            received = len(header) + len(body)
+            message = None
+            try:
+                if header[8] in 'zZ':
+                    body = zlib.decompress(body)
+                message = cPickle.loads(body)[0]
+                if message[0] == 'oersted' and fake.compression:
+                    result, error = ['zlib'], None
+                else:
+                    result, error = fake.dispatch(message), None
+            except Exception as exc:
+                result, error = exc, traceback.format_exc()
+            data = cPickle.dumps([result, error])
+            flag = '1' if error else '0'
+            if fake.compression and len(data) > 1024:
+                data = zlib.compress(data)
+                flag = 'Z' if error else 'z'
+            # counted before replying, the client may look at the counts
+            # as soon as it has the reply
+            if message is not None:
+                fake.count(message, received, 9 + len(data))
+            self.wfile.write('%8d%s%s' % (len(data), flag, data))
+            self.wfile.flush()
+            # Like OpenERP, the connection is closed after an exception
+            if error:
+                return
+
+
+class HTTPHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    "Serves /xmlrpc/<service> and /jsonrpc with persistent connections"
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        fake = self.server.fake
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.path.startswith('/xmlrpc/'):
+            params, method = xmlrpclib.loads(body)
+            message = (self.path[len('/xmlrpc/'):], method) + params
+            try:
+                result = fake.dispatch(message)
+                data = xmlrpclib.dumps((result,), methodresponse=True,
+                                       allow_none=True)
+            except Exception as exc:
+                data = xmlrpclib.dumps(xmlrpclib.Fault(
+                    unicode(exc), traceback.format_exc()))
+            content_type = 'text/xml'
+        else:
+            request = json.loads(body)
+            params = request['params']
+            reply = {'jsonrpc': '2.0', 'id': request.get('id')}
+            message = ((params['service'], params['method'])
+                       + tuple(params['args']))
+            try:
+                reply['result'] = fake.dispatch(message)
+            except Exception as exc:
+                reply['error'] = {'code': 200, 'message': 'Server Error',
+                                  'data': {'message': unicode(exc),
+                                           'debug': traceback.format_exc()}}
+            data = json.dumps(reply)
+            content_type = 'application/json'
+        fake.count(message, len(body), len(data))
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import threading
+import time
+import weakref
+
+
+class IdentityMap(object):
+    """Map (database, model, id) to the Browse instance loaded for it
+
+    Instances are held through weak references and are dropped as soon as
+    nothing else uses them. When size is set, the size most recently used
+    instances are kept alive anyway. When ttl is set, instances older than
+    ttl seconds are replaced by fresh ones.
+    """
+
+    def __init__(self, size=None, ttl=None):
+        self.size = size
+        self.ttl = ttl
+        self._records = {} # key -> (weak reference, time added)
+        self._recent = collections.OrderedDict() # key -> instance
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    def get(self, key):
+        "Return the instance stored for key or None"
+        with self._lock:
+            ref, added = self._records.get(key, (None, None))
+            record = ref() if ref is not None else None
+            if (record is not None and self.ttl is not None
+                and time.time() - added > self.ttl):
+                record = None
+            if record is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if self.size:
+                self._recent.pop(key, None)
+                self._recent[key] = record
+            return record
+
+    def add(self, key, record):
+        def remove(ref, key=key):
+            with self._lock:
+                if self._records.get(key, (None,))[0] is ref:
+                    del self._records[key]
+
+        with self._lock:
+            self._records[key] = (weakref.ref(record, remove), time.time())
+            if self.size:
+                self._recent.pop(key, None)
+                self._recent[key] = record
+                while len(self._recent) > self.size:
+                    self._recent.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._records.pop(key, None)
+            self._recent.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._recent.clear()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger('oersted.metrics')
+
+
+def describe(message):
+    "Return the service, model (None if there is none) and method of message"
+    if message[0] == 'object' and len(message) > 6:
+        if message[1] == 'execute':
+            return message[0], message[5], message[6]
+        return message[0], message[5], message[1]
+    return message[0], None, message[1]
+
+
+class Call(object):
+    """Measures of a message sent by a transport
+
+    sent and received are the bytes of the message and of its reply on the
+    wire, serialization the seconds spent pickling or encoding them and
+    network the seconds spent sending and waiting for the reply.
+    """
+    __slots__ = ('service', 'model', 'method', 'sent', 'received',
+                 'serialization', 'network', 'start', 'duration', 'error')
+
+    def __init__(self, message):
+        self.service, self.model, self.method = describe(message)
+        self.sent = 0
+        self.received = 0
+        self.serialization = 0.0
+        self.network = 0.0
+        self.start = time.time()
+        self.duration = None
+        self.error = None # the exception raised if any
+
+    def __repr__(self):
+        return '<Call %s %s.%s %.1f ms>' % (self.service, self.model,
+                                            self.method,
+                                            (self.duration or 0) * 1000)
+
+
+TOTALS = ('calls', 'errors', 'sent', 'received', 'serialization', 'network',
+          'duration')
+
+
+class Metrics(object):
+    """Totals of the calls made by the transports of a client
+
+    Transports call record() for each message sent. Totals are kept per
+    (service, model, method) and callbacks subscribed are called with each
+    Call, e.g. to export them or to log slow calls::
+
+        >>> client.metrics.subscribe(slow_call_logger(0.5))
+        >>> client.metrics.totals()[('object', 'res.partner', 'read')]
+        {'calls': 12, 'errors': 0, 'sent': 1530, ...}
+    """
+
+    def __init__(self):
+        self._totals = {}
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        "Call callback with each Call recorded"
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._callbacks.remove(callback)
+
+    def record(self, call):
+        call.duration = time.time() - call.start
+        with self._lock:
+            totals = self._totals.get((call.service, call.model, call.method))
+            if totals is None:
+                totals = self._totals[(call.service, call.model,
+                                       call.method)] = dict.fromkeys(TOTALS, 0)
+            totals['calls'] += 1
+            totals['errors'] += call.error is not None
+            for key in TOTALS[2:]:
+                totals[key] += getattr(call, key)
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback(call)
+
+    def totals(self, model=None):
+        """Return the totals by (service, model, method), only the ones of
+        model if it is given"""
+        with self._lock:
+            return dict((key, dict(totals))
+                        for key, totals in self._totals.items()
+                        if model is None or key[1] == model)
+
+    def total(self):
+        "Return the totals of all the calls"
+        result = dict.fromkeys(TOTALS, 0)
+        for totals in self.totals().values():
+            for key in TOTALS:
+                result[key] += totals[key]
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._totals = {}
+
+
+def slow_call_logger(threshold, log=logger):
+    "Return a callback logging the calls taking more than threshold seconds"
+    def callback(call):
+        if call.duration > threshold:
+            log.warning('slow call %s %s.%s: %.3f s (network %.3f s, '
+                        'serialization %.3f s, %d bytes sent, %d received)',
+                        call.service, call.model, call.method, call.duration,
+                        call.network, call.serialization, call.sent,
+                        call.received)
+    return callback
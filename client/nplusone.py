@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Detection of records read one at a time
+
+Browse reads the records of a prefetch group together, records built one by
+one (Model(id) in a loop) are read with an RPC each. Once enabled, this
+module warns when threshold reads of a single record of the same model
+happen back to back, with the line of code which triggered them, and prints
+the worst offenders when the process exits::
+
+    >>> from oersted import nplusone
+    >>> nplusone.enable()
+
+It is also enabled by setting OERSTED_NPLUSONE in the environment.
+"""
+
+import atexit
+import collections
+import logging
+import math
+import os
+import sys
+import threading
+
+logger = logging.getLogger('oersted.nplusone')
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+detector = None # the Detector in use, None when disabled
+_exit_summary = False # whether the summary is printed at exit
+
+
+def location():
+    "Return where the code outside oersted calling it is"
+    frame = sys._getframe(1)
+    while frame is not None and os.path.abspath(
+            frame.f_code.co_filename).startswith(PACKAGE_DIR):
+        frame = frame.f_back
+    if frame is None:
+        return None
+    return '%s:%d in %s' % (frame.f_code.co_filename, frame.f_lineno,
+                            frame.f_code.co_name)
+
+
+def tag(records, instance, attrname):
+    "Remember that records were reached through attrname of instance"
+    if detector is None:
+        return
+    origin = '%s.%s' % (instance._proxy.model, attrname)
+    for record in records:
+        record._origin = origin
+
+
+class Detector(object):
+    """Counts the reads of a single record done in runs of threshold or
+    more reads of the same model"""
+
+    def __init__(self, threshold=10):
+        self.threshold = threshold
+        self.offenders = collections.Counter() # (model, origin, location)
+        self._runs = {} # model -> single reads in a row, the first ones
+        self._prefetch_sizes = {}
+        self._lock = threading.Lock()
+
+    def read(self, record, ids):
+        "Called by Browse._read before reading ids"
+        model = record._proxy.model
+        with self._lock:
+            if len(ids) > 1:
+                self._runs.pop(model, None)
+                return
+            key = (model, record._origin, location())
+            count, first = self._runs.get(model, (0, []))
+            count += 1
+            if count < self.threshold:
+                first.append(key)
+                self._runs[model] = (count, first)
+                return
+            self._runs[model] = (count, [])
+            self._prefetch_sizes[model] = record._prefetch_size
+            for offender in first + [key]:
+                if offender not in self.offenders:
+                    logger.warning('%s records read one at a time%s at %s',
+                                   model, ' through %s' % offender[1]
+                                   if offender[1] else '', offender[2])
+                self.offenders[offender] += 1
+
+    def report(self):
+        """Return (model, origin, location, reads, saved RPCs) tuples, the
+        worst first"""
+        with self._lock:
+            result = []
+            for (model, origin, where), reads in self.offenders.items():
+                # reads of the whole prefetch group at once
+                batched = int(math.ceil(float(reads)
+                                        / self._prefetch_sizes[model]))
+                result.append((model, origin, where, reads, reads - batched))
+        result.sort(key=lambda offender: -offender[3])
+        return result
+
+    def summary(self, limit=10):
+        lines = []
+        for model, origin, where, reads, saved in self.report()[:limit]:
+            lines.append('%6d reads of %s%s at %s, %d RPCs saved if '
+                         'batched' % (reads, model, ' through %s' % origin
+                                      if origin else '', where, saved))
+        return '\n'.join(lines)
+
+
+def _print_summary():
+    if detector is not None and detector.offenders:
+        sys.stderr.write('oersted: records read one at a time\n%s\n'
+                         % detector.summary())
+
+
+def enable(threshold=10):
+    "Start detecting, threshold is the length of the runs reported"
+    global detector, _exit_summary
+    if not _exit_summary:
+        atexit.register(_print_summary)
+        _exit_summary = True
+    detector = Detector(threshold)
+    return detector
+
+
+def disable():
+    global detector
+    detector = None
+
+
+if os.environ.get('OERSTED_NPLUSONE'):
+    enable()
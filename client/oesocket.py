@@ -1,7 +1,15 @@
 # -*- coding: utf-8 -*-
 
-import socket
 import cPickle
+import cStringIO
+import errno
+import socket
+import threading
+import time
+import zlib
+
+from metrics import Call
+
 
 class ERPError(Exception):
 
@@ -23,45 +31,347 @@ class ERPError(Exception):
             return unicode(self.exception).encode('utf-8')
 
 
-class OEConnection(socket.socket):
+def parse_version(version):
+    "Return the version string sent by the server as a tuple of strings"
+    return tuple(version.split('.'))
+
+
+class Transport(object):
+    "Base of the transports, which provide execute(message)"
+
+    def server_version(self):
+        return parse_version(self.execute(('db', 'server_version')))
+
+
+class OEConnection(Transport):
+    """NetRPC connection to an OpenERP server.
+
+    The socket is kept open between messages as long as the server allows it.
+    An idle socket closed by the server is detected before sending and is
+    replaced once by a new connection.
 
-    def __init__(self, host, port, credentials):
+    Messages are pickled with pickle_protocol, the server detects the
+    protocol by itself. A server failing to unpickle a message makes the
+    connection fall back to protocol 0.
+
+    When compression_threshold is set, the connection asks the server
+    whether it accepts zlib compressed messages with an ('oersted',
+    'compression', ['zlib']) message. If it does, bodies of at least
+    compression_threshold bytes are compressed and flagged 'z' (or 'Z' for
+    an exception) instead of '0' (or '1'). Plain OpenERP servers answer that
+    message with an exception and messages are then sent uncompressed.
+    Compressed replies are always understood.
+
+    When metrics is set, each message is measured and recorded to it (see
+    oersted.metrics).
+    """
+
+    # bodies at least that large are not copied to be sent with the header
+    copy_threshold = 65536
+    compression_level = 6
+
+    def __init__(self, host, port, credentials, keepalive=True,
+                 pickle_protocol=cPickle.HIGHEST_PROTOCOL,
+                 compression_threshold=None, compression=None, metrics=None):
         self.host = host
         self.port = port
         self.socket = None
         self.timeout = 5
+        self.keepalive = keepalive
+        self.pickle_protocol = pickle_protocol
+        self.compression_threshold = compression_threshold
+        self.compression = compression # whether the server accepts zlib
+        self.connects = 0 # number of sockets opened
+        self.reuses = 0 # number of messages sent on an already open socket
+        self.reconnects = 0 # number of dead sockets replaced
+        # bytes of pickled bodies (raw) and bytes sent or received for them
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.metrics = metrics
+        self._call = None # Call measuring the message being executed
 
-    def send(self, message, exception=False, traceback=None):
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.settimeout(self.timeout)
-        self.socket.connect((self.host, self.port))
+    def connect(self):
+        self.close()
+        self.socket = socket.create_connection((self.host, self.port),
+                                               self.timeout)
         self.socket.settimeout(None)
-        picked = cPickle.dumps([message, traceback])
-        self.socket.sendall('%8d%s%s' % (len(picked),
-                                         '1' if exception else '0', picked))
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connects += 1
+
+    def close(self):
+        if self.socket is None:
+            return
+        try:
+            self.socket.close()
+        finally:
+            self.socket = None
+
+    def alive(self):
+        "Checks that the idle socket has not been closed by the server"
+        if self.socket is None:
+            return False
+        self.socket.settimeout(0)
+        try:
+            # An idle socket is readable only if the server closed it or
+            # sent something we did not ask for, both make it unusable
+            self.socket.recv(1, socket.MSG_PEEK)
+        except socket.error as exc:
+            return exc.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK)
+        finally:
+            if self.socket is not None:
+                self.socket.settimeout(None)
+        return False
+
+    def write(self, header, body):
+        "Send header and body in the same TCP segments without joining them"
+        cork = getattr(socket, 'TCP_CORK', None)
+        if cork is None or len(body) < self.copy_threshold:
+            self.socket.sendall(header + body)
+            return
+        self.socket.setsockopt(socket.IPPROTO_TCP, cork, 1)
+        try:
+            self.socket.sendall(header)
+            self.socket.sendall(body)
+        finally:
+            self.socket.setsockopt(socket.IPPROTO_TCP, cork, 0)
+
+    def send(self, message, exception=False, traceback=None):
+        start = time.time()
+        picked = cPickle.dumps([message, traceback], self.pickle_protocol)
+        self.counters['raw_sent'] += len(picked)
+        if (self.compression and self.compression_threshold is not None
+            and len(picked) >= self.compression_threshold):
+            picked = zlib.compress(picked, self.compression_level)
+            flag = 'Z' if exception else 'z'
+        else:
+            flag = '1' if exception else '0'
+        self.counters['sent'] += len(picked)
+        header = '%8d%s' % (len(picked), flag)
+        call = self._call
+        if call is None:
+            self.transmit(header, picked)
+            return
+        sent = time.time()
+        call.serialization += sent - start
+        call.sent += len(header) + len(picked)
+        try:
+            self.transmit(header, picked)
+        finally:
+            call.network += time.time() - sent
+
+    def transmit(self, header, picked):
+        "Write a message on the socket, reconnecting if it is dead"
+        if self.socket is not None:
+            if self.alive():
+                try:
+                    self.write(header, picked)
+                    self.reuses += 1
+                    return
+                except socket.error:
+                    pass
+            self.reconnects += 1
+        self.connect()
+        try:
+            self.write(header, picked)
+        except:
+            self.close()
+            raise
 
     def read(self, size):
-        buf = ''
-        while len(buf) < size:
-            chunk = self.socket.recv(size - len(buf))
-            if chunk == '':
+        "Read size bytes into a single preallocated buffer"
+        buf = bytearray(size)
+        view = memoryview(buf)
+        received = 0
+        while received < size:
+            chunk = self.socket.recv_into(view[received:], size - received)
+            if not chunk:
                 raise RuntimeError
-            buf += chunk
+            received += chunk
         return buf
 
     def receive(self):
-        size = int(self.read(8))
-        exception = self.read(1) != '0'
-        obj, err = cPickle.loads(self.read(size))
+        call = self._call
+        start = time.time()
+        try:
+            header = self.read(9)
+            size = int(header[:8])
+            flag = chr(header[8])
+            exception = flag in '1Z'
+            body = self.read(size)
+            self.counters['received'] += size
+            if call is not None:
+                received = time.time()
+                call.network += received - start
+                call.received += 9 + size
+            if flag in 'zZ':
+                body = zlib.decompress(buffer(body))
+            self.counters['raw_received'] += len(body)
+            # cStringIO reads the buffer in place
+            obj, err = cPickle.load(cStringIO.StringIO(body))
+            if call is not None:
+                call.serialization += time.time() - received
+        except:
+            # The stream is out of sync, the socket can not be reused
+            self.close()
+            raise
+
+        # The server drops the connection after having sent an exception
+        if exception or not self.keepalive:
+            self.close()
 
         if isinstance(obj, Exception):
             raise ERPError(obj, err)
         else:
             return obj
 
-        self.socket.close()
-        self.socket = None
+    def negotiate_compression(self):
+        "Ask the server whether it accepts zlib compressed messages"
+        self.send(('oersted', 'compression', ['zlib']))
+        try:
+            return 'zlib' in (self.receive() or [])
+        except ERPError:
+            return False
 
-    def server_version(self):
-        self.send(('db', 'server_version'))
-        return tuple(self.receive().split('.'))
+    def execute(self, message):
+        if self.compression_threshold is not None and self.compression is None:
+            self.compression = self.negotiate_compression()
+        if self.metrics is None:
+            return self._execute(message)
+        self._call = call = Call(message)
+        try:
+            return self._execute(message)
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            self._call = None
+            self.metrics.record(call)
+
+    def _execute(self, message):
+        self.send(message)
+        try:
+            return self.receive()
+        except ERPError as exc:
+            if self.pickle_protocol == 0 or not (
+                    isinstance(exc.exception, cPickle.UnpicklingError)
+                    or 'pickle protocol' in exc.traceback):
+                raise
+        self.pickle_protocol = 0
+        return self._execute(message)
+
+
+COUNTERS = ('raw_sent', 'sent', 'raw_received', 'received')
+# attributes of OEConnection added up by OEConnectionPool
+SOCKET_COUNTERS = ('connects', 'reuses', 'reconnects')
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class OEConnectionPool(Transport):
+    """Bounded pool of OEConnection shared by the threads using a client.
+
+    A connection is checked out for a single message and reply, then given
+    back to the pool. Connections left idle longer than idle_timeout seconds
+    are closed.
+    """
+
+    def __init__(self, host, port, credentials, max_size=4, idle_timeout=60,
+                 checkout_timeout=None, compression_threshold=None,
+                 metrics=None):
+        self.host = host
+        self.port = port
+        self.credentials = credentials
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        # lowered when a server does not understand the highest protocol
+        self.pickle_protocol = cPickle.HIGHEST_PROTOCOL
+        self.compression_threshold = compression_threshold
+        self.compression = None # whether the server accepts zlib
+        self.metrics = metrics # see oersted.metrics
+        # totals of the connections' counters, see OEConnection
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.connects = 0
+        self.reuses = 0
+        self.reconnects = 0
+        self.size = 0 # number of connections created and not evicted
+        self._idle = [] # (release time, connection), most recent last
+        self._cond = threading.Condition()
+        self.checkouts = 0
+        self.waits = 0 # number of checkouts that waited for a connection
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def _evict(self):
+        limit = time.time() - self.idle_timeout
+        while self._idle and self._idle[0][0] < limit:
+            released, conn = self._idle.pop(0)
+            conn.close()
+            self.size -= 1
+
+    def checkout(self):
+        start = time.time()
+        waited = False
+        conn = None
+        with self._cond:
+            while True:
+                self._evict()
+                if self._idle:
+                    released, conn = self._idle.pop()
+                    break
+                if self.size < self.max_size:
+                    self.size += 1
+                    break
+                if self.checkout_timeout is None:
+                    remaining = None
+                else:
+                    remaining = start + self.checkout_timeout - time.time()
+                    if remaining <= 0:
+                        raise PoolTimeoutError
+                waited = True
+                self._cond.wait(remaining)
+            elapsed = time.time() - start
+            self.checkouts += 1
+            if waited:
+                self.waits += 1
+                self.wait_time += elapsed
+                self.max_wait_time = max(self.max_wait_time, elapsed)
+        if conn is None:
+            conn = OEConnection(
+                self.host, self.port, self.credentials,
+                pickle_protocol=self.pickle_protocol,
+                compression_threshold=self.compression_threshold,
+                compression=self.compression)
+        conn.metrics = self.metrics
+        return conn
+
+    def checkin(self, conn):
+        with self._cond:
+            self.pickle_protocol = min(self.pickle_protocol,
+                                       conn.pickle_protocol)
+            if self.compression is None:
+                self.compression = conn.compression
+            for key in COUNTERS:
+                self.counters[key] += conn.counters[key]
+                conn.counters[key] = 0
+            for key in SOCKET_COUNTERS:
+                setattr(self, key, getattr(self, key) + getattr(conn, key))
+                setattr(conn, key, 0)
+            self._idle.append((time.time(), conn))
+            self._cond.notify()
+
+    def execute(self, message):
+        conn = self.checkout()
+        try:
+            return conn.execute(message)
+        finally:
+            self.checkin(conn)
+
+    def close(self):
+        "Closes the idle connections, connections in use are left alone"
+        with self._cond:
+            while self._idle:
+                released, conn = self._idle.pop()
+                conn.close()
+                self.size -= 1
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+import cPickle
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+
+class SchemaCache(object):
+    """On-disk cache of fields_get, fields_view_get and view lookups
+
+    Entries are stored in one file per host, port and database, along with
+    the server version and a signature of the installed modules they were
+    fetched with. When check is True, both are compared with the server the
+    first time a database is used by the process and the entries are dropped
+    if they differ. When check is False, the cache file is trusted and known
+    models do not cost any round trip.
+    """
+
+    def __init__(self, client, path=None, check=True):
+        if path is None:
+            path = os.environ.get('OERSTED_SCHEMA_CACHE',
+                                  os.path.join(os.path.expanduser('~'),
+                                               '.cache', 'oersted'))
+        self.client = client
+        self.path = path
+        self.check = check
+        self._databases = {} # database name -> cache content
+        self._lock = threading.RLock()
+
+    def filename(self, database):
+        name = '%s_%s_%s.schema' % (self.client.host, self.client.port,
+                                    database)
+        return os.path.join(self.path, re.sub(r'[^\w.-]', '_', name))
+
+    def server_signature(self, database):
+        "Return the server version and a signature of the installed modules"
+        module_obj = self.client.create_proxy(database, 'ir.module.module',
+                                              context=False)
+        module_ids = module_obj.search([('state', '=', 'installed')])
+        modules = sorted('%s:%s' % (module['name'], module['latest_version'])
+                         for module in module_obj.read(module_ids,
+                                                       ['name',
+                                                        'latest_version']))
+        return (self.client.capabilities.version,
+                hashlib.sha1('\n'.join(modules)).hexdigest())
+
+    def _load(self, database):
+        if database in self._databases:
+            return self._databases[database]
+        try:
+            with open(self.filename(database), 'rb') as cache_file:
+                content = cPickle.load(cache_file)
+        except (IOError, EOFError, cPickle.UnpicklingError):
+            content = {'signature': None, 'entries': {}}
+        if self.check:
+            signature = self.server_signature(database)
+            if content['signature'] != signature:
+                content = {'signature': signature, 'entries': {}}
+        self._databases[database] = content
+        return content
+
+    def _write(self, filename, content):
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        # Write to a temporary file first so that concurrent processes never
+        # read a truncated cache
+        fd, tmp_name = tempfile.mkstemp(dir=self.path)
+        with os.fdopen(fd, 'wb') as cache_file:
+            cPickle.dump(content, cache_file, cPickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_name, filename)
+
+    def get(self, database, kind, model, key, fetch):
+        """Return the cached entry, fetch() is called to fill it when missing
+
+        :param kind: the kind of entry, e.g. the name of the RPC method
+        :param key: what else the entry depends on (view id, language, ...)
+        """
+        with self._lock:
+            content = self._load(database)
+            if (kind, model, key) in content['entries']:
+                return content['entries'][(kind, model, key)]
+        value = fetch()
+        with self._lock:
+            if content['signature'] is None:
+                content['signature'] = self.server_signature(database)
+            content['entries'][(kind, model, key)] = value
+            self._write(self.filename(database), content)
+        return value
+
+    def invalidate(self, database=None, model=None):
+        """Drop the entries of model, or of every model if model is None, in
+        database, or in every database of the server if database is None"""
+        with self._lock:
+            if database is None:
+                prefix = self.filename('')[:-len('.schema')]
+                filenames = [os.path.join(self.path, name)
+                             for name in (os.listdir(self.path)
+                                          if os.path.isdir(self.path) else [])
+                             if name.endswith('.schema')]
+                filenames = [name for name in filenames
+                             if name.startswith(prefix)]
+                databases = self._databases.keys()
+            else:
+                filenames = [self.filename(database)]
+                databases = [database]
+            for filename in filenames:
+                if not os.path.exists(filename):
+                    continue
+                if model is None:
+                    os.remove(filename)
+                    continue
+                with open(filename, 'rb') as cache_file:
+                    content = cPickle.load(cache_file)
+                for entry_key in content['entries'].keys():
+                    if entry_key[1] == model:
+                        del content['entries'][entry_key]
+                self._write(filename, content)
+            for database in databases:
+                if model is None:
+                    self._databases.pop(database, None)
+                    continue
+                content = self._databases.get(database, {'entries': {}})
+                for entry_key in content['entries'].keys():
+                    if entry_key[1] == model:
+                        del content['entries'][entry_key]
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""Transports carrying messages to the server
+
+A message is a tuple (service, method, arguments...), e.g. ('object',
+'execute', database, uid, password, model, method, ...). Every transport
+provides execute(message) and close(), the Transport base class adds
+server_version() on top of execute.
+OEConnectionPool is the NetRPC transport, XML-RPC and JSON-RPC transports
+are below, along with RecordingTransport and ReplayTransport which record
+the replies of a server to play them back without it.
+"""
+
+import collections
+import cPickle
+import gzip
+import httplib
+import itertools
+import json
+import socket
+import struct
+import threading
+import time
+import xmlrpclib
+import zlib
+
+from metrics import Call
+from oesocket import ERPError, OEConnectionPool, Transport
+from unitofwork import freeze
+
+
+class HTTPTransport(Transport):
+    """Base of the HTTP transports
+
+    HTTP/1.1 connections are kept open and shared by the threads, at most
+    pool_size of them are opened at once. Subclasses provide encode() and
+    decode() for their protocol.
+    """
+    content_type = None
+
+    def __init__(self, host, port, pool_size=4, timeout=None, secure=False,
+                 metrics=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.secure = secure
+        self.metrics = metrics # see oersted.metrics
+        self._idle = []
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(pool_size)
+        self.connects = 0 # number of connections opened
+        self.reuses = 0 # number of requests sent on an open connection
+
+    def connect(self):
+        klass = httplib.HTTPSConnection if self.secure \
+            else httplib.HTTPConnection
+        conn = klass(self.host, self.port, timeout=self.timeout)
+        conn.connect()
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connects += 1
+        return conn
+
+    def post(self, path, body):
+        "Return the body of the reply to a POST of body on path"
+        headers = {'Content-Type': self.content_type,
+                   'Connection': 'keep-alive'}
+        with self._semaphore:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is not None:
+                try:
+                    conn.request('POST', path, body, headers)
+                    response = conn.getresponse()
+                    self.reuses += 1
+                except (httplib.HTTPException, socket.error):
+                    # The server closed the idle connection
+                    conn.close()
+                    conn = None
+            if conn is None:
+                conn = self.connect()
+                conn.request('POST', path, body, headers)
+                response = conn.getresponse()
+            try:
+                data = response.read()
+            except:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                with self._lock:
+                    self._idle.append(conn)
+        if response.status != 200:
+            raise httplib.HTTPException('%s %s' % (response.status,
+                                                   response.reason))
+        return data
+
+    def encode(self, message):
+        "Return the path to post message to and the body of the request"
+        raise NotImplementedError
+
+    def decode(self, data):
+        "Return the result of the body of a reply, raise its ERPError"
+        raise NotImplementedError
+
+    def execute(self, message):
+        call = Call(message)
+        try:
+            start = time.time()
+            path, body = self.encode(message)
+            posted = time.time()
+            call.serialization += posted - start
+            call.sent = len(body)
+            data = self.post(path, body)
+            received = time.time()
+            call.network = received - posted
+            call.received = len(data)
+            try:
+                return self.decode(data)
+            finally:
+                call.serialization += time.time() - received
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            if self.metrics is not None:
+                self.metrics.record(call)
+
+    def close(self):
+        "Closes the idle connections, connections in use are left alone"
+        with self._lock:
+            while self._idle:
+                self._idle.pop().close()
+
+
+class XmlRpcTransport(HTTPTransport):
+    "Transport through the /xmlrpc/<service> endpoints"
+    content_type = 'text/xml'
+
+    def encode(self, message):
+        service, method = message[:2]
+        return '/xmlrpc/%s' % service, xmlrpclib.dumps(
+            tuple(message[2:]), method, allow_none=True, encoding='utf-8')
+
+    def decode(self, data):
+        try:
+            result, = xmlrpclib.loads(data)[0]
+        except xmlrpclib.Fault as fault:
+            # OpenERP puts the message in faultCode and the traceback in
+            # faultString
+            traceback = fault.faultString
+            if isinstance(traceback, unicode):
+                traceback = traceback.encode('utf-8')
+            raise ERPError(Exception(fault.faultCode), traceback)
+        return result
+
+
+class JsonRpcTransport(HTTPTransport):
+    "Transport through the /jsonrpc endpoint of OpenERP >= 8.0"
+    content_type = 'application/json'
+
+    def __init__(self, *args, **kwargs):
+        super(JsonRpcTransport, self).__init__(*args, **kwargs)
+        self._ids = itertools.count(1)
+
+    def encode(self, message):
+        return '/jsonrpc', json.dumps({'jsonrpc': '2.0', 'method': 'call',
+                                       'id': next(self._ids),
+                                       'params': {'service': message[0],
+                                                  'method': message[1],
+                                                  'args': message[2:]}})
+
+    def decode(self, data):
+        reply = json.loads(data)
+        if reply.get('error'):
+            data = reply['error'].get('data') or {}
+            raise ERPError(Exception(data.get('message',
+                                              reply['error']['message'])),
+                           data.get('debug', '').encode('utf-8'))
+        return reply['result']
+
+
+# positions of the passwords in the messages of the db service
+DB_PASSWORDS = {'create': (2, 6), 'create_database': (2, 6), 'drop': (2,),
+                'dump': (2,), 'restore': (2,), 'rename': (2,),
+                'duplicate_database': (2,), 'get_progress': (2,),
+                'change_admin_password': (2, 3)}
+
+
+def replay_key(message):
+    """Return the hashable key under which the reply to message is recorded
+
+    Passwords of common, object and wizard messages and the super admin and
+    admin passwords of db messages are left out, they are neither stored
+    nor needed to replay.
+    """
+    if message[0] in ('common', 'object', 'wizard') and len(message) > 4:
+        message = message[:4] + ('',) + message[5:]
+    elif message[0] == 'db' and len(message) > 1:
+        message = tuple('' if position in DB_PASSWORDS.get(message[1], ())
+                        else item for position, item in enumerate(message))
+    return freeze(message)
+
+
+class RecordingTransport(Transport):
+    """Wraps a transport and records each message and its reply to path
+
+    The file is a gzip stream of pickled (key, result, error, duration)
+    tuples, error being (exception, traceback) when the server raised
+    one. It is flushed after each call, so that the recording of a process
+    which ends without close() can be replayed.
+    """
+
+    def __init__(self, transport, path):
+        self.transport = transport # its metrics measure the calls
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, 'wb')
+
+    def _record(self, entry):
+        with self._lock:
+            if self._file is None:
+                self._file = gzip.open(self.path, 'ab')
+            cPickle.dump(entry, self._file, cPickle.HIGHEST_PROTOCOL)
+            self._file.flush(zlib.Z_SYNC_FLUSH)
+
+    def execute(self, message):
+        start = time.time()
+        try:
+            result = self.transport.execute(message)
+        except ERPError as exc:
+            self._record((replay_key(message), None,
+                          (exc.exception, exc.traceback),
+                          time.time() - start))
+            raise
+        self._record((replay_key(message), result, None,
+                      time.time() - start))
+        return result
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        self.transport.close()
+
+
+class ReplayError(Exception):
+    "The message was not recorded"
+
+
+class ReplayTransport(Transport):
+    """Answers messages with the replies recorded by a RecordingTransport
+
+    With timing 'original', each reply is delayed by the duration of the
+    recorded call, with 'none' it is returned at once. A message recorded
+    several times gets its replies in the recorded order, the last one being
+    repeated afterwards.
+
+    Replies are kept pickled and unpickled for each call, so that callers
+    get their own copy, as from a server.
+    """
+
+    def __init__(self, path, timing='original', metrics=None):
+        if timing not in ('original', 'none'):
+            raise ValueError(timing)
+        self.timing = timing
+        self.metrics = metrics # see oersted.metrics
+        self._replies = collections.defaultdict(collections.deque)
+        self._lock = threading.Lock()
+        recording = gzip.open(path, 'rb')
+        try:
+            while True:
+                try:
+                    entry = cPickle.load(recording)
+                except EOFError:
+                    break
+                except (IOError, struct.error, cPickle.UnpicklingError):
+                    # the recording was not closed, its last entry may be
+                    # truncated and the gzip trailer is missing
+                    if not self._replies:
+                        raise
+                    break
+                self._replies[entry[0]].append(
+                    cPickle.dumps(entry[1:], cPickle.HIGHEST_PROTOCOL))
+        finally:
+            recording.close()
+
+    def execute(self, message):
+        key = replay_key(message)
+        with self._lock:
+            replies = self._replies.get(key)
+            if not replies:
+                raise ReplayError(message)
+            reply = replies.popleft() if len(replies) > 1 else replies[0]
+        call = Call(message)
+        result, error, duration = cPickle.loads(reply)
+        call.serialization = time.time() - call.start
+        call.received = len(reply)
+        if self.timing == 'original':
+            time.sleep(duration)
+            call.network = duration
+        if error is not None:
+            call.error = ERPError(*error)
+        if self.metrics is not None:
+            self.metrics.record(call)
+        if call.error is not None:
+            raise call.error
+        return result
+
+    def close(self):
+        pass
+
+
+TRANSPORTS = {'netrpc': (OEConnectionPool, 8070),
+              'xmlrpc': (XmlRpcTransport, 8069),
+              'jsonrpc': (JsonRpcTransport, 8069)}
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import threading
+
+_local = threading.local()
+
+
+def current():
+    "Return the unit of work active in this thread, None if there is none"
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+
+def freeze(value):
+    "Return a hashable equivalent of an oe_repr value"
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item))
+                            for key, item in value.items()))
+    elif isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class UnitOfWork(object):
+    """Gathers the Browse records saved while it is active and saves them
+    together when it is flushed
+
+    Records of the same model with the same changes are written with a
+    single write(ids, vals), new records are created before the new records
+    referring to them::
+
+        >>> with client.unit_of_work() as uow:
+        ...     for order in Order.search([('state', '=', 'draft')]):
+        ...         order.state = 'cancel'
+        ...         order.save()
+        >>> uow.report
+        {'records': 20000, 'rpcs': 1, 'saved_rpcs': 19999}
+
+    The unit of work is flushed when the with block ends, pending records
+    are discarded if it ends with an exception. Records created in the
+    block only get their id once flushed.
+    """
+
+    def __init__(self):
+        self._records = collections.OrderedDict() # id(record) -> record
+        self.flushing = False
+        self.report = {'records': 0, 'rpcs': 0, 'saved_rpcs': 0}
+
+    def __enter__(self):
+        _local.__dict__.setdefault('stack', []).append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # still the current one while flushing, so that the records it
+        # saves are not registered again by an enclosing unit of work
+        try:
+            if exc_type is None:
+                self.flush()
+            else:
+                self.discard()
+        finally:
+            _local.stack.remove(self)
+
+    def register(self, record):
+        self._records[id(record)] = record
+
+    def discard(self):
+        self._records.clear()
+
+    def _creation_order(self, records):
+        "Sort the new records so that they come after their dependencies"
+        ordered = []
+        seen = set()
+
+        def visit(record):
+            if id(record) in seen:
+                return
+            seen.add(id(record))
+            for dependency in record._dependencies():
+                visit(dependency)
+            ordered.append(record)
+
+        for record in records:
+            visit(record)
+        return ordered
+
+    def flush(self):
+        records = self._records.values()
+        self._records.clear()
+        rpcs = 0
+        self.flushing = True
+        try:
+            for record in self._creation_order([r for r in records
+                                                if r.id is None]):
+                # a record may have been saved as a dependency by oe_repr
+                if record.id is None:
+                    record.save()
+                    rpcs += 1
+
+            writes = collections.OrderedDict()
+            for record in records:
+                if not record._changed:
+                    continue
+                vals = record.oe_repr
+                key = (record._proxy.database, record._proxy.model,
+                       freeze(vals))
+                writes.setdefault(key, (record._proxy, vals, []))[2].append(
+                    record)
+            for proxy, vals, group in writes.values():
+                proxy.write([record.id for record in group], vals)
+                rpcs += 1
+                for record in group:
+                    record._clean_cache()
+        finally:
+            self.flushing = False
+        report = self.report
+        report['records'] += len(records)
+        report['rpcs'] += rpcs
+        report['saved_rpcs'] = report['records'] - report['rpcs']
+        return self.report
@@ -81,20 +81,34 @@ class View(object):
 
 class MetaView(type):
 
-    def create_properties(cls, view_id):
+    def parse_view(cls, view_id):
+        """Return the fields of the view and the on_change of those found in
+        its arch, None for the ones without on_change"""
         view_data = cls.Browse.proxy.fields_view_get(view_id)
-        cls._fields = view_data['fields'].keys()
+        fields = view_data['fields'].keys()
         view_xml = lxml.etree.fromstring(view_data['arch'])
 
-        for field_name in cls._fields:
+        on_changes = {}
+        for field_name in fields:
             field_node = view_xml.xpath("//field[@name='%s']" % field_name)
             if not field_node:
                 continue
-            field_node = field_node[0]
-            if 'on_change' in field_node.attrib:
+            on_changes[field_name] = field_node[0].attrib.get('on_change')
+        return fields, on_changes
+
+    def create_properties(cls, view_id):
+        proxy = cls.Browse.proxy
+        if proxy.schema is None:
+            cls._fields, on_changes = cls.parse_view(view_id)
+        else:
+            cls._fields, on_changes = proxy.schema.get(
+                proxy.database, 'view_fields', proxy.model,
+                (view_id, proxy.lang), lambda: cls.parse_view(view_id))
+
+        for field_name, on_change in on_changes.items():
+            if on_change:
                 setattr(cls, field_name,
-                        OnchangeDescriptor(field_name,
-                                           field_node.attrib['on_change']))
+                        OnchangeDescriptor(field_name, on_change))
             else:
                 setattr(cls, field_name, ViewDescriptor(field_name))
 
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""Tests running against oersted.fakeserver
+
+    python -m unittest discover -s tests -t .
+"""
+
+import sys
+import unittest
+
+if sys.version_info[0] > 2:
+    raise unittest.SkipTest('oersted runs on Python 2')
+
+import imp
+import os
+
+try:
+    import oersted
+except ImportError:
+    # run from a checkout, where the package is the client directory
+    imp.load_module('oersted', *imp.find_module('client', [
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]))
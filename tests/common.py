@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from oersted import OEClient
+from oersted.fakeserver import FakeServer
+
+
+class ServerTestCase(unittest.TestCase):
+    """Starts a FakeServer holding bench.record (see add_synthetic_model)
+    and logs a client in"""
+
+    server_version = '6.0.4'
+    records = 50
+    lines = 100
+    client_options = {}
+
+    def setUp(self):
+        self.server = FakeServer(version=self.server_version)
+        self.server.add_synthetic_model('bench.record', self.records,
+                                        self.lines)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.client = self.connect(**self.client_options)
+        self.database = self.server.database
+
+    def connect(self, **options):
+        client = OEClient('127.0.0.1', self.server.netrpc_port, **options)
+        self.addCleanup(client.close)
+        client.login(self.server.database, self.server.login,
+                     self.server.password)
+        return client
+
+    def calls(self, method=None):
+        "Return the number of calls to method received by the server"
+        return sum(count for (model, name), count in self.server.calls.items()
+                   if method is None or name == method)
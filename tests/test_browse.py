@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+import decimal
+import math
+
+from oersted.browse import MISSING
+
+from common import ServerTestCase
+
+
+class PrefetchTest(ServerTestCase):
+
+    records = 450
+
+    def test_search_reads_by_prefetch_group(self):
+        Record = self.client.create_browse(self.database, 'bench.record')
+        records = Record.search([])
+        self.server.reset()
+        names = [record.name for record in records]
+        self.assertEqual(names, [u'bench.record %d' % id
+                                 for id in range(1, self.records + 1)])
+        self.assertEqual(self.calls('read'), int(math.ceil(
+            float(self.records) / Record._prefetch_size)))
+
+    def test_groups_sliced(self):
+        Record = self.client.create_browse(self.database, 'bench.record')
+        records = Record.search([])
+        size = Record._prefetch_size
+        self.assertEqual(records[size + 1]._prefetch,
+                         records[size:2 * size])
+
+    def test_conversions_bounded_to_group(self):
+        Record = self.client.create_browse(self.database, 'bench.record')
+        records = Record.search_read([])
+        size = Record._prefetch_size
+        records[0].amount
+        records[0].category_id
+        self.assertIsNot(records[size - 1]._cached('amount'), MISSING)
+        self.assertIs(records[size]._cached('amount'), MISSING)
+        self.assertIs(records[size]._cached('category_id'), MISSING)
+        self.assertTrue(len(records[0].category_id._prefetch) <= size)
+
+    def test_deferred_field_read_alone(self):
+        Record = self.client.create_browse(self.database, 'bench.record')
+        records = Record.search([])
+        records[0].name
+        self.server.reset()
+        records[0].image
+        self.assertEqual(self.calls('read'), 1)
+        self.assertNotIn('image', records[1]._oe_values)
+
+    def test_conversions(self):
+        Record = self.client.create_browse(self.database, 'bench.record')
+        record = Record.search([], limit=1)[0]
+        self.assertEqual(record.amount, decimal.Decimal('1.25'))
+        self.assertEqual(record.date.year, 2013)
+        self.assertEqual(record.category_id.name, u'Category 2')
+
+
+class IterSearchTest(ServerTestCase):
+
+    def test_pages(self):
+        Record = self.client.create_browse(self.database, 'bench.record')
+        for order_by in (None, 'name'):
+            self.server.reset()
+            records = list(Record.iter_search([], batch_size=20,
+                                              order_by=order_by))
+            self.assertEqual(len(records), self.records)
+            # the last page is short, no search after it
+            self.assertEqual(self.calls('search'), 3)
+
+
+class IdentityMapTest(ServerTestCase):
+
+    client_options = {'identity_map': True}
+
+    def test_same_instance(self):
+        Record = self.client.create_browse(self.database, 'bench.record')
+        self.assertIs(Record(1), Record(1))
+        self.assertIs(Record.search([('id', '=', 2)])[0], Record(2))
+
+    def test_refreshed_by_search_read(self):
+        Record = self.client.create_browse(self.database, 'bench.record')
+        record = Record(2)
+        self.assertEqual(record.name, u'bench.record 2')
+        self.assertEqual(record.amount, decimal.Decimal('2.5'))
+        self.server.models['bench.record'].write([2], {'name': u'changed',
+                                                      'amount': 3.0})
+        self.assertIs(Record.search_read([('id', '=', 2)])[0], record)
+        self.assertEqual(record.name, u'changed')
+        self.assertEqual(record.amount, decimal.Decimal('3.0'))
+
+
+class CompactIdentityMapTest(IdentityMapTest):
+
+    client_options = {'identity_map': True, 'compact': True}
+
+
+class ClientClassesTest(ServerTestCase):
+
+    def test_per_client(self):
+        Record = self.client.create_browse(self.database, 'bench.record')
+        other = self.connect(identity_map=True, float_conversion='float',
+                             compact=True)
+        OtherRecord = other.create_browse(self.database, 'bench.record')
+        self.assertIsNot(OtherRecord, Record)
+        self.assertIs(OtherRecord._client, other)
+        self.assertIs(other.create_browse(self.database, 'bench.record'),
+                      OtherRecord)
+        self.assertIsNot(OtherRecord(1), Record(1))
+        self.assertIs(OtherRecord(1), OtherRecord(1))
+        self.assertEqual(OtherRecord(1).amount, 1.25)
+        self.assertIsInstance(OtherRecord(1).amount, float)
+        self.assertIsInstance(Record(1).amount, decimal.Decimal)
+        # related classes are the ones of the client of the record
+        self.assertIs(type(OtherRecord(1).category_id),
+                      other.create_browse(self.database,
+                                          'bench.record.category'))
+
+
+class UnitOfWorkTest(ServerTestCase):
+
+    def test_writes_batched(self):
+        Record = self.client.create_browse(self.database, 'bench.record')
+        records = Record.browse(range(1, 6))
+        self.server.reset()
+        with self.client.unit_of_work() as uow:
+            for record in records:
+                record.state = 'draft'
+                record.save()
+        self.assertEqual(self.calls('write'), 1)
+        self.assertEqual(uow.report['records'], 5)
+        self.assertEqual([record.state for record in Record.browse(
+            range(1, 6))], ['draft'] * 5)
+
+    def test_nested(self):
+        Record = self.client.create_browse(self.database, 'bench.record')
+        with self.client.unit_of_work():
+            outer = Record(name=u'outer')
+            outer.save()
+            with self.client.unit_of_work():
+                inner = Record(name=u'inner')
+                inner.save()
+            self.assertIsNotNone(inner.id)
+            self.assertIsNone(outer.id)
+        self.assertIsNotNone(outer.id)
+        self.assertEqual(Record(inner.id).name, u'inner')
+
+    def test_discarded_on_error(self):
+        Record = self.client.create_browse(self.database, 'bench.record')
+        try:
+            with self.client.unit_of_work():
+                Record(name=u'lost').save()
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(Record.count([('name', '=', u'lost')]), 0)
+
+
+class CreateManyTest(ServerTestCase):
+
+    server_version = '7.0'
+
+    def test_order_and_values(self):
+        Record = self.client.create_browse(self.database, 'bench.record')
+        values = [{'name': u'a', 'quantity': 3}, {'name': u'b'}, {},
+                  {'name': u'c', 'quantity': 4}, {'name': u'd'}]
+        ids = Record.create_many(values, chunk_size=10)
+        self.assertEqual(len(set(ids)), len(values))
+        self.assertEqual([(record.name, record.quantity)
+                          for record in Record.browse(ids)],
+                         [(u'a', 3), (u'b', False), (False, False),
+                          (u'c', 4), (u'd', False)])
+        # one load per set of fields given, create for the empty one
+        self.assertEqual(self.calls('load'), 2)
+        self.assertEqual(self.calls('create'), 1)
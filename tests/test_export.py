@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import StringIO
+
+from common import ServerTestCase
+
+FIELDS = ['id', '.id', 'name', 'amount', 'category_id', 'category_id/id',
+          'category_id/name', 'line_ids/name']
+
+
+class ColumnsTest(ServerTestCase):
+
+    def test_ids(self):
+        Record = self.client.create_browse(self.database, 'bench.record')
+        columns = Record.to_columns(['name', 'amount', 'category_id'],
+                                    ids=[3, 1])
+        self.assertEqual(list(columns['id']), [3, 1])
+        self.assertEqual(list(columns['name']), [u'bench.record 3',
+                                                 u'bench.record 1'])
+        self.assertEqual(list(columns['amount']), [3.75, 1.25])
+        self.assertEqual(list(columns['category_id']), [4, 2])
+
+    def test_domain(self):
+        Record = self.client.create_browse(self.database, 'bench.record')
+        columns = Record.to_columns(['quantity'],
+                                    domain=[('state', '=', 'draft')],
+                                    batch_size=7)
+        self.assertEqual(list(columns['id']), range(3, self.records + 1, 3))
+        self.assertEqual(len(Record.to_columns(['name'])['id']),
+                         self.records)
+        self.assertEqual(len(Record.to_columns(['name'], ids=[])['id']), 0)
+
+
+class ExportTest(ServerTestCase):
+
+    def export(self, **options):
+        Record = self.client.create_browse(self.database, 'bench.record')
+        output = StringIO.StringIO()
+        count = Record.export_csv(output, FIELDS, batch_size=20, **options)
+        self.assertEqual(count, self.records)
+        return list(csv.reader(StringIO.StringIO(output.getvalue())))
+
+    def test_export_data_and_reads(self):
+        self.server.add_xml_id('bench.record_1', 'bench.record', 1)
+        exported = self.export()
+        self.assertEqual(exported[0], FIELDS)
+        self.assertEqual(len(exported), self.records + 1)
+        self.assertEqual(exported[1][:5], ['bench.record_1', '1',
+                                           'bench.record 1', '1.25',
+                                           'Category 2'])
+        self.assertEqual(exported[1][5:7], ['bench_record.category_2',
+                                            'Category 2'])
+        self.assertEqual(exported[1][7], 'Line 0,Line 50')
+        # export_data gave the other records external ids
+        self.client.capabilities._unsupported.add('export_data')
+        self.assertEqual(self.export(), exported)
+
+    def test_resume(self):
+        exported = self.export()
+        output = StringIO.StringIO()
+        Record = self.client.create_browse(self.database, 'bench.record')
+        Record.export_csv(output, FIELDS, offset=30)
+        self.assertEqual(list(csv.reader(StringIO.StringIO(
+            output.getvalue()))), exported[31:])
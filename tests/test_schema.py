@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+import shutil
+import tempfile
+
+from common import ServerTestCase
+
+
+class SchemaCacheTest(ServerTestCase):
+
+    def setUp(self):
+        super(SchemaCacheTest, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def fields(self, **options):
+        client = self.connect(schema_cache=self.path, **options)
+        self.server.reset()
+        client.create_browse(self.database, 'bench.record')
+        return self.calls('fields_get'), self.calls('search')
+
+    def test_checked(self):
+        self.assertEqual(self.fields(), (1, 1))
+        # cached, but still checked against the installed modules
+        self.assertEqual(self.fields(), (0, 1))
+
+    def test_unchecked(self):
+        self.fields()
+        self.assertEqual(self.fields(schema_check=False), (0, 0))
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+
+from oersted import OEClient
+from oersted.transport import ReplayError, ReplayTransport, replay_key
+
+from common import ServerTestCase
+
+
+class RecordReplayTest(ServerTestCase):
+
+    def setUp(self):
+        super(RecordReplayTest, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'session.rec')
+
+    def session(self, client):
+        Record = client.create_browse(self.database, 'bench.record')
+        records = Record.search([('state', '=', 'draft')], limit=5)
+        return [(record.name, record.amount, record.category_id.name)
+                for record in records]
+
+    def replay(self):
+        client = OEClient(transport=ReplayTransport(self.path, timing='none'))
+        client.login(self.database, self.server.login, self.server.password)
+        return self.session(client)
+
+    def test_replay(self):
+        client = self.connect(record=self.path)
+        result = self.session(client)
+        client.close()
+        self.server.reset()
+        self.assertEqual(self.replay(), result)
+        self.assertEqual(self.calls(), 0)
+
+    def test_replay_without_close(self):
+        client = self.connect(record=self.path)
+        result = self.session(client)
+        self.assertEqual(self.replay(), result)
+
+    def test_not_recorded(self):
+        client = self.connect(record=self.path)
+        client.close()
+        client = OEClient(transport=ReplayTransport(self.path, timing='none'))
+        self.assertRaises(ReplayError, client.execute, ('db', 'list'))
+
+    def test_passwords_not_recorded(self):
+        self.assertEqual(replay_key(('db', 'create', 'super', 'demo', False,
+                                     'en_US', 'admin')),
+                         ('db', 'create', '', 'demo', False, 'en_US', ''))
+        self.assertEqual(replay_key(('db', 'drop', 'super', 'demo')),
+                         ('db', 'drop', '', 'demo'))
+        self.assertEqual(replay_key(('db', 'list')), ('db', 'list'))